@@ -0,0 +1,265 @@
+"""JSON API журнала, версия 1 (/api/v1).
+
+Классы, ученики, поиск учеников по ФИО, посещаемость, оценки и агрегаты отчёта
+для мобильного приложения, дашбордов и подсказок при вводе. Доступ — по той же
+сессии, что и у веб-интерфейса; без входа API отвечает 401 в JSON, а не
+перенаправлением на страницу входа.
+
+Посещаемость и оценки отдаются страницами с курсором по (date, id): следующая
+страница начинается строго после последней записи предыдущей, поэтому запрос
+не зависит от глубины листания. Для выгрузки больших периодов есть потоковые
+варианты в формате NDJSON (одна запись в строке), которые читают базу порциями.
+
+Каждый ответ несёт ETag и Last-Modified по ревизии журнала (journal_revision).
+Если данные не менялись, повторный запрос с If-None-Match/If-Modified-Since
+получает 304 после одного чтения строки ревизии.
+"""
+import json
+from datetime import datetime
+from functools import wraps
+
+from flask import Blueprint, jsonify, request, session, g, Response, stream_with_context
+from sqlalchemy import select, and_, or_
+
+from models import db, Student, Attendance, Grade
+from journal import current_revision
+from reporting import build_student_report
+from search import search_students
+import auth
+import cache
+
+API_VERSION = 1
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH = 1000
+
+api = Blueprint('api', __name__, url_prefix=f'/api/v{API_VERSION}')
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@api.errorhandler(ApiError)
+def _api_error(error):
+    return jsonify({'error': error.message}), error.status
+
+
+@api.errorhandler(404)
+def _not_found(error):
+    return jsonify({'error': 'not found'}), 404
+
+
+def api_login_required(f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        teacher = auth.get_teacher(session['teacher_id']) if 'teacher_id' in session else None
+        if teacher is None:
+            raise ApiError(401, 'authentication required')
+        g.teacher = teacher
+        return f(*args, **kwargs)
+    return wrapper
+
+
+def revalidated(f):
+    """Отвечает 304 по ETag/Last-Modified ревизии журнала, не вызывая обработчик."""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        revision, updated_at = current_revision()
+        etag = f'v{API_VERSION}-r{revision}'
+        if request.if_none_match:
+            fresh = request.if_none_match.contains(etag)
+        else:
+            since = request.if_modified_since
+            fresh = since is not None and since.replace(tzinfo=None) >= updated_at
+        if fresh:
+            response = Response(status=304)
+        else:
+            response = f(*args, **kwargs)
+        response.set_etag(etag)
+        response.last_modified = updated_at
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
+
+
+def _date_arg(name, required=True):
+    value = request.args.get(name)
+    if not value:
+        if required:
+            raise ApiError(400, f'parameter {name} is required')
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ApiError(400, f'parameter {name} must be YYYY-MM-DD')
+
+
+def _int_arg(name, default=None):
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(400, f'parameter {name} must be an integer')
+
+
+def _cursor_arg():
+    """Курсор имеет вид 'YYYY-MM-DD:id' — дата и id последней записи предыдущей страницы."""
+    value = request.args.get('after')
+    if not value:
+        return None
+    try:
+        day, record_id = value.split(':')
+        return datetime.strptime(day, '%Y-%m-%d').date(), int(record_id)
+    except ValueError:
+        raise ApiError(400, 'parameter after must be YYYY-MM-DD:id')
+
+
+def _journal_query(model, value_column):
+    """Запрос записей журнала по параметрам start, end, class_id, subject_id, student_id."""
+    start = _date_arg('start')
+    end = _date_arg('end')
+    query = select(model.id, model.student_id, model.subject_id, model.date, value_column).where(
+        model.date >= start, model.date <= end
+    )
+    class_id = _int_arg('class_id')
+    if class_id is not None:
+        query = query.where(model.student_id.in_(
+            select(Student.id).where(Student.class_id == class_id)
+        ))
+    subject_id = _int_arg('subject_id')
+    if subject_id is not None:
+        query = query.where(model.subject_id == subject_id)
+    student_id = _int_arg('student_id')
+    if student_id is not None:
+        query = query.where(model.student_id == student_id)
+    return query.order_by(model.date, model.id)
+
+
+def _record(row, value_name):
+    return {
+        'id': row.id,
+        'student_id': row.student_id,
+        'subject_id': row.subject_id,
+        'date': row.date.isoformat(),
+        value_name: row[4],
+    }
+
+
+def _page(model, value_column, value_name):
+    query = _journal_query(model, value_column)
+    cursor = _cursor_arg()
+    if cursor is not None:
+        day, record_id = cursor
+        query = query.where(or_(
+            model.date > day,
+            and_(model.date == day, model.id > record_id)
+        ))
+    limit = min(max(_int_arg('limit', PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    items = [_record(row, value_name) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = f'{last.date.isoformat()}:{last.id}'
+    return jsonify({'items': items, 'next': next_cursor})
+
+
+def _stream(model, value_column, value_name):
+    query = _journal_query(model, value_column).execution_options(yield_per=STREAM_BATCH)
+
+    def generate():
+        for row in db.session.execute(query):
+            yield json.dumps(_record(row, value_name), ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@api.route('/classes')
+@api_login_required
+@revalidated
+def classes():
+    return jsonify({'items': [class_._asdict() for class_ in cache.get_classes()]})
+
+
+@api.route('/subjects')
+@api_login_required
+@revalidated
+def subjects():
+    return jsonify({'items': [subject._asdict() for subject in cache.get_subjects()]})
+
+
+@api.route('/classes/<int:class_id>/students')
+@api_login_required
+@revalidated
+def class_students(class_id):
+    cache.get_class_or_404(class_id)
+    return jsonify({'items': [student._asdict() for student in cache.get_roster(class_id)]})
+
+
+@api.route('/students/search')
+@api_login_required
+@revalidated
+def student_search():
+    class_names = {class_.id: class_.name for class_ in cache.get_classes()}
+    students = search_students(request.args.get('q', ''), _int_arg('limit', 10))
+    return jsonify({'items': [
+        {'id': student_id, 'full_name': full_name, 'class_id': class_id,
+         'class_name': class_names.get(class_id)}
+        for student_id, full_name, class_id in students
+    ]})
+
+
+@api.route('/attendance')
+@api_login_required
+@revalidated
+def attendance():
+    return _page(Attendance, Attendance.present, 'present')
+
+
+@api.route('/attendance.ndjson')
+@api_login_required
+@revalidated
+def attendance_stream():
+    return _stream(Attendance, Attendance.present, 'present')
+
+
+@api.route('/grades')
+@api_login_required
+@revalidated
+def grades():
+    return _page(Grade, Grade.value, 'value')
+
+
+@api.route('/grades.ndjson')
+@api_login_required
+@revalidated
+def grades_stream():
+    return _stream(Grade, Grade.value, 'value')
+
+
+@api.route('/reports')
+@api_login_required
+@revalidated
+def report():
+    class_id = _int_arg('class_id')
+    subject_id = _int_arg('subject_id')
+    if class_id is None or subject_id is None:
+        raise ApiError(400, 'parameters class_id and subject_id are required')
+    cache.get_class_or_404(class_id)
+    cache.get_subject_or_404(subject_id)
+    start = _date_arg('start')
+    end = _date_arg('end')
+    return jsonify({
+        'class_id': class_id,
+        'subject_id': subject_id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'students': build_student_report(class_id, subject_id, start, end),
+    })
@@ -0,0 +1,272 @@
+"""Архив закрытых учебных лет.
+
+Учебный год идёт с 1 сентября по 31 августа. archive_year() переносит посещаемость
+и оценки закрытого года в отдельный файл SQLite instance/archive/journal_<год>-<год+1>.db:
+те же таблицы attendance и grade с индексами плюс снимок классов, предметов и
+учеников на момент переноса. Из рабочей базы записи удаляются, сводки на границах
+года пересчитываются, а место возвращается через VACUUM. Перенесённые годы
+перечислены в таблице archived_year.
+
+Архивные файлы только читаются. Отчёты за период, который задевает архивный год,
+досчитывают посещаемость и оценки по его файлу (см. reporting.py); формы журнала
+и импорт записи за архивные даты не принимают. Общешкольная сводка и выгрузки
+журнала через API показывают только рабочую базу.
+
+Переносить год можно только из рабочей базы SQLite: VACUUM блокирует её на время
+сжатия, поэтому команду лучше запускать вне учебных часов.
+"""
+import datetime
+import os
+import time
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.orm import Session
+
+from models import db, ArchivedYear, Class, Subject, Student, Attendance, Grade
+from journal import bump_revision
+import summary
+
+ARCHIVE_DIR = 'archive'
+# Журнал года переносится целиком, справочники — снимком на момент переноса
+JOURNAL_TABLES = (Attendance.__table__, Grade.__table__)
+SNAPSHOT_TABLES = (Class.__table__, Subject.__table__, Student.__table__)
+
+ArchiveResult = namedtuple('ArchiveResult', [
+    'year', 'path', 'attendance_rows', 'grade_rows',
+    'size_before', 'size_after', 'archive_size', 'timings'
+])
+
+
+class ArchiveError(ValueError):
+    """Год нельзя перенести в архив: он не закрыт, уже перенесён или пуст."""
+
+
+def school_year(date):
+    """Год начала учебного года, в который попадает дата."""
+    return date.year if date.month >= 9 else date.year - 1
+
+
+def year_bounds(year):
+    """Первый и последний день учебного года, начавшегося в сентябре year."""
+    return datetime.date(year, 9, 1), datetime.date(year + 1, 8, 31)
+
+
+def archive_dir():
+    return os.path.join(current_app.instance_path, ARCHIVE_DIR)
+
+
+def _file_size(path):
+    # Для базы в режиме WAL незаписанные страницы лежат в соседнем файле -wal
+    return sum(os.path.getsize(name) for name in (path, path + '-wal') if os.path.exists(name))
+
+
+def _live_path():
+    engine = db.engine
+    if engine.dialect.name != 'sqlite' or not engine.url.database or engine.url.database == ':memory:':
+        raise ArchiveError('Архив поддерживается только для рабочей базы в файле SQLite')
+    return os.path.abspath(engine.url.database)
+
+
+def _create_archive(path):
+    """Создаёт пустой файл архива с таблицами журнала и справочников."""
+    engine = create_engine('sqlite:///' + path)
+    try:
+        db.metadata.create_all(engine, tables=[*SNAPSHOT_TABLES, *JOURNAL_TABLES])
+    finally:
+        engine.dispose()
+
+
+def _copy_year(conn, start_date, end_date):
+    """Копирует в подключённый архив справочники и журнал за период.
+
+    Возвращает {модель: число скопированных записей журнала}.
+    """
+    counts = {}
+    for table in SNAPSHOT_TABLES:
+        columns = ', '.join(column.name for column in table.columns)
+        conn.exec_driver_sql(f'INSERT INTO arch.{table.name} ({columns}) SELECT {columns} FROM main.{table.name}')
+    for model in (Attendance, Grade):
+        table = model.__table__
+        columns = ', '.join(column.name for column in table.columns)
+        counts[model] = conn.execute(text(
+            f'INSERT INTO arch.{table.name} ({columns}) SELECT {columns} FROM main.{table.name} '
+            'WHERE date BETWEEN :start AND :end'
+        ), {'start': start_date.isoformat(), 'end': end_date.isoformat()}).rowcount
+    conn.exec_driver_sql('ANALYZE arch')
+    return counts
+
+
+def _vacuum():
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.exec_driver_sql('VACUUM')
+        # Без контрольной точки освобождённое место осталось бы в файле -wal
+        conn.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)')
+
+
+def archive_year(year, vacuum=True):
+    """Переносит закрытый учебный год в архивный файл и возвращает ArchiveResult.
+
+    Копирование и удаление идут одной транзакцией на соединении рабочей базы под
+    блокировкой записи (BEGIN IMMEDIATE): пока год не отмечен в archived_year,
+    формы и импорт его принимают, и правка между копированием и удалением
+    пропала бы. Под блокировкой такая правка либо попадёт в архив вместе
+    с остальными записями, либо дождётся конца переноса и получит отказ.
+    """
+    start_date, end_date = year_bounds(year)
+    if end_date >= datetime.date.today():
+        raise ArchiveError(f'Учебный год {year}/{year + 1} ещё не закончился')
+    if db.session.get(ArchivedYear, year) is not None:
+        raise ArchiveError(f'Учебный год {year}/{year + 1} уже в архиве')
+    live_path = _live_path()
+
+    timings = {}
+    size_before = _file_size(live_path)
+    os.makedirs(archive_dir(), exist_ok=True)
+    filename = f'journal_{year}-{year + 1}.db'
+    path = os.path.join(archive_dir(), filename)
+    if os.path.exists(path):
+        # Остаток прерванного переноса: год не записан в archived_year
+        os.remove(path)
+    _create_archive(path)
+
+    # Перенос начинается в новой транзакции сессии
+    db.session.remove()
+    try:
+        conn = db.session.connection()
+        # ATTACH нельзя выполнить внутри транзакции, поэтому он идёт до BEGIN.
+        # Архив потом открывается только на чтение, режим WAL рабочей базы ему не нужен
+        conn.exec_driver_sql('ATTACH DATABASE ? AS arch', (path,))
+        conn.exec_driver_sql('PRAGMA arch.journal_mode = DELETE')
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+
+        started = time.perf_counter()
+        counts = _copy_year(conn, start_date, end_date)
+        if not any(counts.values()):
+            raise ArchiveError(f'За учебный год {year}/{year + 1} нет записей журнала')
+        timings['copy'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        # Ученики, у которых пропадут записи года: их прогноз нужно пересчитать
+        student_ids = {
+            student_id
+            for model in (Attendance, Grade)
+            for (student_id,) in db.session.query(model.student_id).filter(
+                model.date >= start_date, model.date <= end_date
+            ).distinct()
+        }
+        for model in (Attendance, Grade):
+            model.query.filter(
+                model.date >= start_date, model.date <= end_date
+            ).delete(synchronize_session=False)
+        summary.rebuild_period(start_date, end_date)
+        db.session.add(ArchivedYear(
+            year=year, start_date=start_date, end_date=end_date, path=filename,
+            attendance_rows=counts[Attendance], grade_rows=counts[Grade],
+            archived_at=datetime.datetime.utcnow().replace(microsecond=0)
+        ))
+        bump_revision(student_ids)
+        db.session.commit()
+        timings['delete'] = time.perf_counter() - started
+    except Exception:
+        db.session.rollback()
+        os.remove(path)
+        raise
+    finally:
+        # Архив остался подключён к соединению в пуле: закрываем соединения пула
+        db.session.remove()
+        db.engine.dispose()
+
+    if vacuum:
+        started = time.perf_counter()
+        _vacuum()
+        timings['vacuum'] = time.perf_counter() - started
+
+    return ArchiveResult(
+        year, path, counts[Attendance], counts[Grade],
+        size_before, _file_size(live_path), os.path.getsize(path), timings
+    )
+
+
+def years_between(start_date, end_date):
+    """Архивные годы, которые задевает период, по порядку."""
+    return ArchivedYear.query.filter(
+        ArchivedYear.start_date <= end_date, ArchivedYear.end_date >= start_date
+    ).order_by(ArchivedYear.year).all()
+
+
+def archived_ranges():
+    """Периоды (начало, конец) всех архивных лет."""
+    return db.session.query(ArchivedYear.start_date, ArchivedYear.end_date).order_by(ArchivedYear.year).all()
+
+
+def is_archived(date):
+    return db.session.query(ArchivedYear.year).filter(
+        ArchivedYear.start_date <= date, ArchivedYear.end_date >= date
+    ).first() is not None
+
+
+def _session(year):
+    """Сессия только для чтения над файлом архивного года; движки живут весь процесс."""
+    engines = current_app.extensions.setdefault('journal_archive', {})
+    engine = engines.get(year.path)
+    if engine is None:
+        path = os.path.join(archive_dir(), year.path)
+        engine = engines[year.path] = create_engine(f'sqlite:///file:{path}?mode=ro&uri=true')
+    return Session(engine)
+
+
+def _scoped(query, model, student_ids, subject_id):
+    if student_ids is not None:
+        query = query.filter(model.student_id.in_(student_ids))
+    if subject_id is not None:
+        query = query.filter(model.subject_id == subject_id)
+    return query
+
+
+def attendance_totals(years, start_date, end_date, student_ids=None, subject_id=None):
+    """Возвращает {(student_id, subject_id): (total_days, present_days)} по архивным годам."""
+    totals = {}
+    for year in years:
+        with _session(year) as session:
+            rows = _scoped(session.query(
+                Attendance.student_id, Attendance.subject_id,
+                func.count(Attendance.id), summary._present_sum()
+            ).filter(
+                Attendance.date >= start_date, Attendance.date <= end_date
+            ), Attendance, student_ids, subject_id).group_by(Attendance.student_id, Attendance.subject_id)
+            for student_id, subject, total, present in rows:
+                old_total, old_present = totals.get((student_id, subject), (0, 0))
+                totals[student_id, subject] = (old_total + total, old_present + (present or 0))
+    return totals
+
+
+def grade_rows(years, start_date, end_date, student_ids=None, subject_id=None):
+    """(student_id, subject_id, value) архивных оценок за период в порядке добавления."""
+    rows = []
+    for year in years:
+        with _session(year) as session:
+            rows.extend(_scoped(session.query(Grade.student_id, Grade.subject_id, Grade.value).filter(
+                Grade.date >= start_date, Grade.date <= end_date
+            ), Grade, student_ids, subject_id).order_by(Grade.id).all())
+    return rows
+
+
+def daily_attendance(years, class_id, subject_id, start_date, end_date):
+    """(день, присутствий, отметок) класса по предмету из архивных лет.
+
+    Состав класса берётся из снимка учеников, сделанного при переносе года.
+    """
+    rows = []
+    for year in years:
+        with _session(year) as session:
+            rows.extend(session.query(
+                Attendance.date, summary._present_sum(), func.count(Attendance.id)
+            ).join(Student, Student.id == Attendance.student_id).filter(
+                Student.class_id == class_id,
+                Attendance.subject_id == subject_id,
+                Attendance.date >= start_date,
+                Attendance.date <= end_date
+            ).group_by(Attendance.date).order_by(Attendance.date).all())
+    return rows
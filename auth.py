@@ -0,0 +1,108 @@
+"""Хэширование паролей учителей и кэш их записей.
+
+Пароли хранятся как хэши werkzeug (pbkdf2:sha256 с настраиваемым числом итераций
+PASSWORD_HASH_ITERATIONS). Старые записи с открытым паролем и хэши с другим
+числом итераций перехэшируются при успешном входе.
+
+Записи учителей, нужные на каждой странице, кэшируются в приложении (LRU в
+app.extensions), чтобы login_required и шаблоны не читали таблицу teacher на
+каждый запрос. Логин и ФИО учителя после регистрации не меняются, поэтому
+записи кэша не устаревают.
+"""
+import hmac
+import threading
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from flask import current_app, session, flash, redirect, url_for, g
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from models import db, Teacher
+
+HASH_PREFIXES = ('pbkdf2:', 'scrypt:')
+TEACHER_CACHE_SIZE = 256
+
+CachedTeacher = namedtuple('CachedTeacher', ['id', 'username', 'full_name'])
+
+_teacher_lock = threading.Lock()
+_dummy_hash = None
+
+
+def hash_method():
+    return f"pbkdf2:sha256:{current_app.config['PASSWORD_HASH_ITERATIONS']}"
+
+
+def hash_password(password):
+    return generate_password_hash(password, method=hash_method())
+
+
+def is_hashed(stored):
+    return stored.startswith(HASH_PREFIXES) and stored.count('$') == 2
+
+
+def check_password(stored, password):
+    """Проверяет пароль. Возвращает (совпал ли, нужно ли перехэшировать запись)."""
+    if not is_hashed(stored):
+        # Запись из времён открытых паролей
+        ok = hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8'))
+        return ok, ok
+    ok = check_password_hash(stored, password)
+    return ok, ok and stored.split('$', 1)[0] != hash_method()
+
+
+def authenticate(username, password):
+    """Ищет учителя по логину и паролю, при необходимости обновляя хэш пароля."""
+    global _dummy_hash
+    teacher = Teacher.query.filter_by(username=username).first()
+    if teacher is None:
+        # Тратим столько же времени, сколько на настоящую проверку,
+        # чтобы по времени ответа нельзя было перебирать логины
+        if _dummy_hash is None:
+            _dummy_hash = hash_password('dummy-password')
+        check_password_hash(_dummy_hash, password)
+        return None
+    ok, needs_rehash = check_password(teacher.password, password)
+    if not ok:
+        return None
+    if needs_rehash:
+        teacher.password = hash_password(password)
+        db.session.commit()
+    return teacher
+
+
+def _teacher_cache():
+    # У каждого приложения свой кэш: в разных базах под одним id могут быть разные учителя
+    return current_app.extensions.setdefault('teacher_cache', OrderedDict())
+
+
+def get_teacher(teacher_id):
+    """Возвращает CachedTeacher из LRU-кэша приложения или None, если учителя нет."""
+    teachers = _teacher_cache()
+    with _teacher_lock:
+        cached = teachers.get(teacher_id)
+        if cached is not None:
+            teachers.move_to_end(teacher_id)
+            return cached
+    teacher = db.session.get(Teacher, teacher_id)
+    if teacher is None:
+        return None
+    cached = CachedTeacher(teacher.id, teacher.username, teacher.full_name)
+    with _teacher_lock:
+        teachers[teacher_id] = cached
+        if len(teachers) > TEACHER_CACHE_SIZE:
+            teachers.popitem(last=False)
+    return cached
+
+
+# Функция для проверки авторизации
+def login_required(f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        teacher = get_teacher(session['teacher_id']) if 'teacher_id' in session else None
+        if teacher is None:
+            session.pop('teacher_id', None)
+            flash('Пожалуйста, войдите в систему.', 'danger')
+            return redirect(url_for('auth.login'))
+        g.teacher = teacher
+        return f(*args, **kwargs)
+    return wrapper
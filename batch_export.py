@@ -0,0 +1,79 @@
+"""Выгрузка отчётов по всей школе одним ZIP-архивом.
+
+Данные за период читаются несколькими общими запросами (reporting.build_school_report),
+PDF по каждому классу и предмету собираются параллельно в пуле процессов, а архив
+отдаётся по частям: в памяти одновременно держится лишь несколько готовых PDF.
+"""
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from pdf_export import init_pdf, render_report_pdf
+from reporting import build_school_report
+
+
+class _ZipStream:
+    """Файлоподобный приёмник для zipfile: накапливает байты до очередной выдачи."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _render_entry(entry):
+    filename, title, student_data = entry
+    return filename, render_report_pdf(title, student_data)
+
+
+def _safe_name(name):
+    return ''.join('_' if c in '/\\:*?"<>|' else c for c in name)
+
+
+def collect_entries(start_date, end_date):
+    """Готовит задания на рендер: (имя файла в архиве, заголовок, строки отчёта)."""
+    entries = []
+    for class_, subject, student_data in build_school_report(start_date, end_date):
+        entries.append((
+            f"{_safe_name(class_.name)}/{_safe_name(subject.name)}.pdf",
+            f"Отчёт по классу {class_.name} ({subject.name}) с {start_date} по {end_date}",
+            student_data
+        ))
+    return entries
+
+
+def iter_zip(entries, font_path, workers=None):
+    """Рендерит PDF в пуле процессов и по мере готовности выдаёт куски ZIP-архива."""
+    stream = _ZipStream()
+    archive = zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_DEFLATED)
+    pending = iter(entries)
+    workers = workers or os.cpu_count() or 1
+    # Держим в работе не больше двух заданий на процесс, чтобы не копить PDF в памяти
+    limit = workers * 2
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_pdf, initargs=(font_path,)) as executor:
+        in_flight = set()
+        while True:
+            while len(in_flight) < limit:
+                entry = next(pending, None)
+                if entry is None:
+                    break
+                in_flight.add(executor.submit(_render_entry, entry))
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                filename, pdf = future.result()
+                archive.writestr(filename, pdf)
+                yield stream.drain()
+    archive.close()
+    yield stream.drain()
@@ -0,0 +1,100 @@
+"""Размер рабочей базы и время отчётов до и после переноса прошлых лет в архив.
+
+Создаёт временную базу SQLite, заполняет её журналом за несколько учебных лет,
+замеряет отчёт за последнюю четверть, отчёт за всю историю и форму посещаемости,
+затем переносит в архив все учебные годы, кроме последнего (archive.archive_year),
+и повторяет замеры. Отчёт за всю историю после переноса читает и архивные файлы.
+
+    python benchmarks/bench_archive.py --years 4 --classes 20 --students 30
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from models import db, Student, Attendance, Grade
+from migrations import upgrade_database
+from reporting import build_student_report
+from journal import load_attendance
+from datagen import generate
+import archive
+
+
+def timed(label, func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+        db.session.rollback()
+    elapsed = (time.perf_counter() - started) / repeat * 1000
+    print(f'  {label:<40} {elapsed:8.2f} мс')
+    return elapsed
+
+
+def run_queries(first_day, last_day, repeat):
+    term_start = last_day - datetime.timedelta(days=90)
+    roster = [student_id for (student_id,) in db.session.query(Student.id).filter_by(class_id=1)]
+    return {
+        'term': timed('отчёт по классу за четверть', lambda: build_student_report(1, 1, term_start, last_day), repeat),
+        'history': timed('отчёт по классу за все годы', lambda: build_student_report(1, 1, first_day, last_day), repeat),
+        'form': timed('загрузка формы посещаемости', lambda: load_attendance(roster, 1, last_day), repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', type=int, default=4)
+    parser.add_argument('--classes', type=int, default=10)
+    parser.add_argument('--students', type=int, default=30)
+    parser.add_argument('--subjects', type=int, default=5)
+    parser.add_argument('--grade-rate', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    mb = 1024 * 1024
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__, instance_path=tmp)
+        path = os.path.join(tmp, 'bench.db')
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            upgrade_database()
+            generate(classes=args.classes, students=args.students, subjects=args.subjects,
+                     years=args.years, grade_rate=args.grade_rate)
+            first_day, last_day = db.session.query(
+                db.func.min(Attendance.date), db.func.max(Attendance.date)
+            ).one()
+            rows = Attendance.query.count() + Grade.query.count()
+            db.session.remove()
+            db.engine.dispose()
+            print(f'Записей журнала: {rows}, база {os.path.getsize(path) / mb:.1f} МБ')
+
+            print('Всё в рабочей базе:')
+            before = run_queries(first_day, last_day, args.repeat)
+
+            last_year = archive.school_year(last_day)
+            for year in range(archive.school_year(first_day), last_year):
+                result = archive.archive_year(year)
+                steps = ', '.join(f'{step} {seconds:.2f} с' for step, seconds in result.timings.items())
+                print(f'Архив {year}/{year + 1}: {result.attendance_rows + result.grade_rows} записей, '
+                      f'база {result.size_before / mb:.1f} -> {result.size_after / mb:.1f} МБ, '
+                      f'файл архива {result.archive_size / mb:.1f} МБ ({steps})')
+
+            print(f'Прошлые годы в архиве, в рабочей базе {last_year}/{last_year + 1}:')
+            after = run_queries(first_day, last_day, args.repeat)
+
+            for key in before:
+                print(f'Изменение {key}: x{before[key] / after[key]:.2f}')
+            db.session.remove()
+            for engine in app.extensions.get('journal_archive', {}).values():
+                engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Сравнение планов запросов и времени выборок журнала без индексов и с индексами.
+
+Создаёт временную базу SQLite, заполняет её журналом за несколько учебных лет,
+прогоняет запросы форм и отчётов без индексов журнала, затем применяет миграции
+и повторяет замеры.
+
+    python benchmarks/bench_indexes.py --years 3 --classes 20 --students 30
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import text
+
+from models import db, Student, Attendance, Grade
+from migrations import upgrade_database, MIGRATIONS
+from reporting import build_student_report
+from journal import load_attendance
+from datagen import generate
+
+JOURNAL_INDEXES = [
+    'uq_attendance_student_subject_date',
+    'uq_grade_student_subject_date',
+    'ix_attendance_subject_date_student',
+    'ix_grade_subject_date_student',
+    'ix_student_class_id',
+]
+
+
+def explain(sql, params):
+    rows = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql), params).all()
+    return [row[-1] for row in rows]
+
+
+def timed(label, func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+        db.session.rollback()
+    elapsed = (time.perf_counter() - started) / repeat * 1000
+    print(f'  {label:<40} {elapsed:8.2f} мс')
+    return elapsed
+
+
+def run_queries(repeat):
+    last_day = db.session.query(db.func.max(Attendance.date)).scalar()
+    term_start = last_day - datetime.timedelta(days=90)
+    roster = [student_id for (student_id,) in db.session.query(Student.id).filter_by(class_id=1)]
+
+    plans = {
+        'attendance report': (
+            'SELECT student_id, count(id), sum(present) FROM attendance '
+            'WHERE student_id IN (SELECT id FROM student WHERE class_id = :class_id) '
+            'AND subject_id = :subject_id AND date BETWEEN :start AND :end GROUP BY student_id',
+            {'class_id': 1, 'subject_id': 1, 'start': term_start, 'end': last_day}),
+        'attendance form': (
+            'SELECT * FROM attendance WHERE student_id IN (SELECT id FROM student WHERE class_id = :class_id) '
+            'AND subject_id = :subject_id AND date = :day',
+            {'class_id': 1, 'subject_id': 1, 'day': last_day}),
+    }
+    for label, (sql, params) in plans.items():
+        print(f'  план: {label}')
+        for line in explain(sql, params):
+            print(f'    {line}')
+
+    return {
+        'report': timed('отчёт по классу за четверть', lambda: build_student_report(1, 1, term_start, last_day), repeat),
+        'form': timed('загрузка формы посещаемости', lambda: load_attendance(roster, 1, last_day), repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--classes', type=int, default=10)
+    parser.add_argument('--students', type=int, default=30)
+    parser.add_argument('--subjects', type=int, default=5)
+    parser.add_argument('--grade-rate', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            for name in JOURNAL_INDEXES:
+                db.session.execute(text(f'DROP INDEX IF EXISTS {name}'))
+            db.session.commit()
+
+            started = time.perf_counter()
+            generate(classes=args.classes, students=args.students, subjects=args.subjects,
+                     years=args.years, grade_rate=args.grade_rate)
+            rows = db.session.query(Attendance).count() + db.session.query(Grade).count()
+            print(f'Сгенерировано {rows} записей журнала за {time.perf_counter() - started:.1f} с')
+
+            print('Без индексов журнала:')
+            before = run_queries(args.repeat)
+
+            db.session.execute(text('PRAGMA user_version = 0'))
+            db.session.commit()
+            upgrade_database()
+            print(f'С индексами (схема версии {len(MIGRATIONS)}):')
+            after = run_queries(args.repeat)
+
+            for key in before:
+                print(f'Ускорение {key}: x{before[key] / after[key]:.1f}')
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Замер стоимости входа учителя при разном числе итераций хэша пароля.
+
+Показывает время одной проверки пароля, сколько входов в секунду выдерживает
+одно ядро и какую долю процессора займёт утренний пик входов. По этим цифрам
+выбирается PASSWORD_HASH_ITERATIONS.
+
+    python benchmarks/bench_login.py --peak-logins 300 --peak-minutes 10 --cores 2
+"""
+import argparse
+import os
+import time
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_ITERATIONS = [100000, 300000, 600000, 1000000]
+
+
+def time_check(iterations, repeat):
+    stored = generate_password_hash('password123', method=f'pbkdf2:sha256:{iterations}')
+    started = time.perf_counter()
+    for _ in range(repeat):
+        check_password_hash(stored, 'password123')
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, nargs='*', default=DEFAULT_ITERATIONS)
+    parser.add_argument('--peak-logins', type=int, default=300, help='Входов за утренний пик.')
+    parser.add_argument('--peak-minutes', type=float, default=10, help='Длительность пика, минут.')
+    parser.add_argument('--cores', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rate = args.peak_logins / (args.peak_minutes * 60)
+    print(f'Пик: {rate:.2f} входов/с на {args.cores} ядрах')
+    print(f'{"итераций":>10} {"проверка, мс":>14} {"входов/с/ядро":>15} {"загрузка CPU":>13}')
+    for iterations in args.iterations:
+        seconds = time_check(iterations, args.repeat)
+        load = rate * seconds / args.cores * 100
+        print(f'{iterations:>10} {seconds * 1000:>14.1f} {1 / seconds:>15.1f} {load:>12.1f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""Замеры горячих страниц журнала на синтетических данных.
+
+Создаёт временную базу SQLite, наполняет её через datagen.py и прогоняет через
+тестовый клиент Flask формы посещаемости и оценок (открытие и сохранение),
+отчёты, прогноз и JSON API. Для каждого сценария печатает перцентили задержки,
+число SQL-запросов на запрос и пиковую память (tracemalloc, отдельным проходом,
+чтобы трассировка не искажала время). Бюджеты запросов из QUERY_BUDGETS
+проверяются на каждом запросе: превышение завершает прогон с ошибкой.
+
+Результаты сохраняются в JSON; с --compare печатается разница с прошлым прогоном:
+
+    python benchmarks/bench_routes.py --classes 20 --students 30 --days 180 -o before.json
+    python benchmarks/bench_routes.py --classes 20 --students 30 --days 180 -o after.json --compare before.json
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        value = samples[0] if samples else 0
+        return {'p50': value, 'p90': value, 'p95': value, 'p99': value}
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {'p50': cuts[49], 'p90': cuts[89], 'p95': cuts[94], 'p99': cuts[98]}
+
+
+def scenarios(client, class_ids, subject_ids, days):
+    """Сценарии: (название, метод, путь, функция номера повтора -> данные формы).
+
+    Данные готовятся до замера, так что открытие формы перед сохранением в него не входит.
+    """
+    from journal_forms import attendance_changes, grade_changes
+
+    def pick(items, n):
+        return items[n % len(items)]
+
+    def form(n):
+        return {'class_id': pick(class_ids, n), 'subject_id': pick(subject_ids, n // len(class_ids)),
+                'date': str(pick(days, n * 7))}
+
+    def attendance_submit(n):
+        # Открываем форму и сохраняем её с переключённой отметкой каждого ученика
+        data = form(n)
+        html = client.post('/attendance', data=data).get_data(as_text=True)
+        return dict(data, submit_attendance='1', **attendance_changes(html))
+
+    def grades_submit(n):
+        # Открываем форму и сохраняем её с изменённой оценкой каждого ученика
+        data = form(n)
+        html = client.post('/grades', data=data).get_data(as_text=True)
+        return dict(data, submit_grades='1', **grade_changes(html))
+
+    def report(n):
+        end = days[-1]
+        return {'class_id': pick(class_ids, n), 'subject_id': pick(subject_ids, n),
+                'start_date': str(end - datetime.timedelta(days=90)), 'end_date': str(end)}
+
+    def api_page(n):
+        return {'start': str(days[0]), 'end': str(days[-1]), 'class_id': pick(class_ids, n), 'limit': 500}
+
+    return [
+        ('classes', 'GET', '/classes', None),
+        ('class_detail', 'GET', lambda n: f'/class/{pick(class_ids, n)}', None),
+        ('attendance_form', 'POST', '/attendance', form),
+        ('attendance_save', 'POST', '/attendance', attendance_submit),
+        ('grades_form', 'POST', '/grades', form),
+        ('grades_save', 'POST', '/grades', grades_submit),
+        ('report', 'POST', '/reports', report),
+        ('forecast', 'GET', '/forecast', None),
+        ('api_attendance_page', 'GET', '/api/v1/attendance', api_page),
+    ]
+
+
+def run(client, engine, items, repeat, warmup):
+    from sqlalchemy import event
+
+    queries = [0]
+
+    def count(*args):
+        queries[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', count)
+    results = {}
+    devnull = open(os.devnull, 'w')
+    try:
+        for name, method, path, data in items:
+            def prepare(n):
+                url = path(n) if callable(path) else path
+                with contextlib.redirect_stdout(devnull):
+                    return url, data(n) if data else None
+
+            def call(url, payload):
+                with contextlib.redirect_stdout(devnull):
+                    if method == 'GET':
+                        response = client.get(url, query_string=payload)
+                    else:
+                        response = client.post(url, data=payload)
+                if response.status_code >= 400:
+                    raise RuntimeError(f'{name}: HTTP {response.status_code}')
+
+            for n in range(warmup):
+                call(*prepare(n))
+            latencies, counts = [], []
+            for n in range(repeat):
+                request = prepare(n)
+                queries[0] = 0
+                started = time.perf_counter()
+                call(*request)
+                latencies.append((time.perf_counter() - started) * 1000)
+                counts.append(queries[0])
+
+            request = prepare(repeat)
+            tracemalloc.start()
+            call(*request)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results[name] = dict(
+                percentiles(latencies),
+                mean=statistics.fmean(latencies),
+                queries=statistics.median(counts),
+                peak_kb=peak / 1024,
+            )
+            row = results[name]
+            print(f"{name:<22} {row['p50']:>8.2f} {row['p95']:>8.2f} {row['p99']:>8.2f} "
+                  f"{row['queries']:>8.0f} {row['peak_kb']:>10.0f}")
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+        devnull.close()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, path):
+    with open(path, encoding='utf-8') as f:
+        before = json.load(f)['results']
+    print(f'\nСравнение с {path}:')
+    print(f'{"сценарий":<22} {"p50":>10} {"p95":>10} {"запросов":>10} {"память":>10}')
+    for name, row in results.items():
+        old = before.get(name)
+        if old is None:
+            continue
+
+        def delta(key):
+            return f"{(row[key] - old[key]) / old[key] * 100:+.0f}%" if old[key] else '—'
+        print(f"{name:<22} {delta('p50'):>10} {delta('p95'):>10} "
+              f"{row['queries'] - old['queries']:>+10.0f} {delta('peak_kb'):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--schools', type=int, default=1)
+    parser.add_argument('--classes', type=int, default=10)
+    parser.add_argument('--students', type=int, default=30)
+    parser.add_argument('--subjects', type=int, default=5)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--grade-rate', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--output', '-o', default=None, help='Куда сохранить результаты (JSON).')
+    parser.add_argument('--compare', default=None, help='JSON прошлого прогона для сравнения.')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    # Приложение читает настройки при импорте, поэтому окружение готовится заранее
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+    os.environ.setdefault('SECRET_KEY', 'bench')
+    os.environ['PASSWORD_HASH_ITERATIONS'] = '1000'
+    # Превышение QUERY_BUDGETS прерывает прогон: N+1 видно сразу, а не по росту задержки
+    os.environ['QUERY_BUDGET_ENFORCE'] = '1'
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    from app import create_app
+    from models import db, Teacher
+    from migrations import upgrade_database
+    from auth import hash_password
+    from datagen import generate, school_days
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        upgrade_database()
+        started = time.perf_counter()
+        counts = generate(args.schools, args.classes, args.students, args.subjects, days=args.days,
+                          grade_rate=args.grade_rate)
+        db.session.add(Teacher(username='bench', password=hash_password('bench'), full_name='Замер'))
+        db.session.commit()
+        print(f"Данные: {counts} за {time.perf_counter() - started:.1f} с")
+        engine = db.engine
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+    class_ids = list(range(1, args.schools * args.classes + 1))
+    subject_ids = list(range(1, args.subjects + 1))
+    days = list(school_days(days=args.days))
+
+    print(f'{"сценарий":<22} {"p50, мс":>8} {"p95, мс":>8} {"p99, мс":>8} {"запросов":>8} {"пик, КБ":>10}')
+    results = run(client, engine, scenarios(client, class_ids, subject_ids, days), args.repeat, args.warmup)
+
+    report = {
+        'revision': git_revision(),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'params': vars(args),
+        'data': counts,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'Результаты сохранены в {args.output}')
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Холодный старт приложения и память воркера.
+
+Каждый этап запускается в новом процессе Python несколько раз; печатаются медиана
+времени и пиковый RSS процесса. «Старт» — это то, что делает каждый воркер gunicorn
+(импорт app и create_app()), следующие этапы показывают, сколько стоят отложенные
+до первого обращения библиотеки: NumPy для прогноза и ReportLab для PDF.
+
+    python benchmarks/bench_startup.py --repeat 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRELUDE = '''
+import resource, time
+started = time.perf_counter()
+from app import create_app
+app = create_app()
+'''
+
+STAGES = [
+    ('старт воркера', ''),
+    ('+ первый запрос', '''
+app.test_client().get('/login')
+'''),
+    ('+ прогноз (NumPy)', '''
+import forecast
+'''),
+    ('+ PDF (ReportLab)', '''
+import pdf_export
+pdf_export.init_pdf()
+pdf_export.render_report_pdf('Замер', [])
+'''),
+]
+
+REPORT = '''
+elapsed = time.perf_counter() - started
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+
+def measure(code, env, repeat):
+    times, rss = [], []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', code], cwd=ROOT, env=env, check=True, capture_output=True, text=True
+        ).stdout.split()
+        times.append(float(output[0]))
+        rss.append(int(output[1]) / 1024)  # ru_maxrss в Linux — в килобайтах
+    return statistics.median(times) * 1000, statistics.median(rss)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'startup.db')
+        env.setdefault('SECRET_KEY', 'startup')
+        print(f'{"этап":<20} {"время, мс":>10} {"RSS, МБ":>10}')
+        code = PRELUDE
+        for label, stage in STAGES:
+            # Этапы накапливаются: каждый следующий включает предыдущие
+            code += stage
+            elapsed, rss = measure(code + REPORT, env, args.repeat)
+            print(f'{label:<20} {elapsed:>10.0f} {rss:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Генератор синтетического журнала для замеров.
+
+Создаёт школы × классы × учеников × предметы и историю посещаемости и оценок
+за заданное число учебных дней (будни с сентября, без летних каникул). У каждого
+ученика своя склонность пропускать уроки и свой средний балл, поэтому отчёты и
+прогнозы получаются похожими на настоящие. Записи вставляются пачками по дню,
+недельные сводки пересобираются в конце.
+
+Используется из bench_indexes.py и bench_routes.py, а также отдельно — чтобы
+наполнить базу для ручной проверки:
+
+    python benchmarks/datagen.py --database /tmp/big.db --schools 2 --classes 20 --students 30 --days 180
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, Class, Student, Subject, Attendance, Grade
+import summary
+
+SUBJECT_NAMES = ['Математика', 'Русский язык', 'Литература', 'Физика', 'История',
+                 'География', 'Биология', 'Химия', 'Английский язык', 'Информатика']
+LAST_NAMES = ['Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев',
+              'Соколов', 'Михайлов', 'Новиков', 'Фёдоров', 'Морозов', 'Волков', 'Алексеев']
+MALE_NAMES = ['Иван', 'Пётр', 'Алексей', 'Дмитрий', 'Сергей', 'Андрей', 'Максим']
+FEMALE_NAMES = ['Анна', 'Мария', 'Елена', 'Ольга', 'Дарья', 'Софья', 'Полина']
+
+
+def school_days(days=None, years=None, start=None):
+    """Учебные дни: будни с 1 сентября, кроме июня–августа.
+
+    Задаётся либо числом дней, либо числом учебных лет до текущего года.
+    """
+    if start is None:
+        start = datetime.date(datetime.date.today().year - (years or 1), 9, 1)
+    end = datetime.date(start.year + years, 6, 1) if years else None
+    day, count = start, 0
+    while (end is None or day < end) and (days is None or count < days):
+        if day.weekday() < 5 and day.month not in (6, 7, 8):
+            yield day
+            count += 1
+        day += datetime.timedelta(days=1)
+
+
+def _full_name(rng):
+    last = rng.choice(LAST_NAMES)
+    if rng.random() < 0.5:
+        return f'{last} {rng.choice(MALE_NAMES)}'
+    return f'{last}а {rng.choice(FEMALE_NAMES)}'
+
+
+def generate(schools=1, classes=10, students=30, subjects=5, days=None, years=None,
+             grade_rate=0.2, seed=42, summaries=True, progress=None):
+    """Наполняет пустую базу и возвращает {'students': ..., 'attendance': ..., 'grades': ...}.
+
+    Коммит выполняется после каждого учебного дня, чтобы транзакции оставались короткими.
+    """
+    rng = random.Random(seed)
+    class_names = [
+        f'{school + 1}-{grade}{letter}' if schools > 1 else f'{grade}{letter}'
+        for school in range(schools)
+        for grade, letter in ((5 + n // 4, 'АБВГ'[n % 4]) for n in range(classes))
+    ]
+    db.session.execute(Class.__table__.insert(), [{'name': name} for name in class_names])
+    db.session.execute(Subject.__table__.insert(), [
+        {'name': SUBJECT_NAMES[n] if n < len(SUBJECT_NAMES) else f'Предмет {n + 1}'}
+        for n in range(subjects)
+    ])
+    student_rows = [
+        {'full_name': _full_name(rng), 'class_id': class_id}
+        for class_id in range(1, len(class_names) + 1) for _ in range(students)
+    ]
+    db.session.execute(Student.__table__.insert(), student_rows)
+    db.session.commit()
+
+    student_ids = list(range(1, len(student_rows) + 1))
+    subject_ids = list(range(1, subjects + 1))
+    # Склонность к пропускам и средний балл у каждого ученика свои
+    presence = {student_id: rng.uniform(0.75, 0.99) for student_id in student_ids}
+    ability = {student_id: rng.uniform(2.8, 4.8) for student_id in student_ids}
+
+    counts = {'students': len(student_ids), 'attendance': 0, 'grades': 0}
+    for day in school_days(days=days, years=years if days is None else None):
+        attendance, grades = [], []
+        for student_id in student_ids:
+            for subject_id in subject_ids:
+                present = rng.random() < presence[student_id]
+                attendance.append({'date': day, 'present': present,
+                                   'student_id': student_id, 'subject_id': subject_id})
+                if present and rng.random() < grade_rate:
+                    value = min(5, max(2, round(rng.gauss(ability[student_id], 0.7))))
+                    grades.append({'date': day, 'value': value,
+                                   'student_id': student_id, 'subject_id': subject_id})
+        db.session.execute(Attendance.__table__.insert(), attendance)
+        if grades:
+            db.session.execute(Grade.__table__.insert(), grades)
+        db.session.commit()
+        counts['attendance'] += len(attendance)
+        counts['grades'] += len(grades)
+        if progress is not None:
+            progress(day, counts)
+
+    if summaries:
+        summary.rebuild()
+        db.session.commit()
+    return counts
+
+
+def main():
+    from flask import Flask
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', required=True, help='Файл SQLite (будет создан).')
+    parser.add_argument('--schools', type=int, default=1)
+    parser.add_argument('--classes', type=int, default=10, help='Классов в каждой школе.')
+    parser.add_argument('--students', type=int, default=30, help='Учеников в классе.')
+    parser.add_argument('--subjects', type=int, default=5)
+    parser.add_argument('--days', type=int, default=120, help='Учебных дней истории.')
+    parser.add_argument('--grade-rate', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if os.path.exists(args.database):
+        parser.error(f'{args.database} уже существует')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.abspath(args.database)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        counts = generate(args.schools, args.classes, args.students, args.subjects, days=args.days,
+                          grade_rate=args.grade_rate, seed=args.seed)
+        elapsed = time.perf_counter() - started
+        rows = counts['attendance'] + counts['grades']
+        print(f"Учеников: {counts['students']}, отметок: {counts['attendance']}, оценок: {counts['grades']}")
+        print(f'Сгенерировано за {elapsed:.1f} с ({rows / elapsed:.0f} записей/с)')
+
+
+if __name__ == '__main__':
+    main()
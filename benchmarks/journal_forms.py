@@ -0,0 +1,48 @@
+"""Данные для сохранения форм журнала в замерах.
+
+Форма посещаемости и оценок несёт для каждого ученика скрытые поля orig_<id>
+(значение при открытии) и version_<id> (версия записи). Сохранение без них сервер
+считает правкой поверх чужих изменений: ничего не пишет и показывает конфликты,
+так что замер «сохранения» мерил бы только перерисовку формы. Поэтому сценарии
+сначала открывают форму и отправляют её поля обратно вместе с изменениями.
+"""
+import re
+
+HIDDEN_FIELD = re.compile(r'name="(orig|version)_(\d+)" value="([^"]*)"')
+
+
+def hidden_fields(html):
+    """{student_id: {'orig': ..., 'version': ...}} по странице открытой формы."""
+    fields = {}
+    for name, student_id, value in HIDDEN_FIELD.findall(html):
+        fields.setdefault(student_id, {})[name] = value
+    return fields
+
+
+def _with_hidden(student_id, fields):
+    return {f'orig_{student_id}': fields['orig'], f'version_{student_id}': fields['version']}
+
+
+def attendance_changes(html):
+    """Поля сохранения формы посещаемости, в которой переключена каждая отметка."""
+    payload = {}
+    for student_id, fields in hidden_fields(html).items():
+        payload.update(_with_hidden(student_id, fields))
+        # Чекбокс отправляется только отмеченным: отсутствовавшие и неотмеченные становятся присутствующими
+        if fields['orig'] != '1':
+            payload[f'present_{student_id}'] = 'on'
+    return payload
+
+
+def grade_changes(html):
+    """Поля сохранения формы оценок, в которой изменена каждая оценка.
+
+    Оценки идут по кругу 2 → 3 → 4 → 5 → 2, пустые ячейки получают 4: сохранение
+    обновляет существующие записи и вставляет новые.
+    """
+    payload = {}
+    for student_id, fields in hidden_fields(html).items():
+        payload.update(_with_hidden(student_id, fields))
+        orig = fields['orig']
+        payload[f'grade_{student_id}'] = str((int(orig) - 1) % 4 + 2) if orig else '4'
+    return payload
@@ -0,0 +1,173 @@
+"""Нагрузочный тест: как пропускная способность растёт с числом воркеров gunicorn.
+
+Для каждого числа воркеров поднимает gunicorn на копии базы, запускает несколько
+«учителей»-потоков, которые входят в систему и по кругу открывают формы,
+сохраняют посещаемость (с полями только что открытой формы, см. journal_forms.py)
+и строят отчёты, и печатает запросы в секунду, задержки и число ошибок (в том
+числе «database is locked»).
+
+    python benchmarks/load_test.py --workers 1 2 4 --clients 16 --duration 20
+    DATABASE_URL=postgresql://... python benchmarks/load_test.py --no-copy
+"""
+import argparse
+import datetime
+import http.cookiejar
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from journal_forms import attendance_changes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(base_url + '/login', timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn не запустился')
+
+
+class Teacher(threading.Thread):
+    def __init__(self, base_url, username, password, stop_at, class_ids, subject_ids):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.username = username
+        self.password = password
+        self.stop_at = stop_at
+        self.class_ids = class_ids
+        self.subject_ids = subject_ids
+        self.latencies = []
+        self.errors = 0
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def post(self, path, data):
+        """Отправляет форму; возвращает текст ответа или None при ошибке."""
+        body = urllib.parse.urlencode(data).encode()
+        started = time.perf_counter()
+        try:
+            with self.opener.open(self.base_url + path, body, timeout=30) as response:
+                html = response.read().decode('utf-8')
+        except urllib.error.HTTPError:
+            self.errors += 1
+        except OSError:
+            self.errors += 1
+        else:
+            self.latencies.append(time.perf_counter() - started)
+            return html
+        return None
+
+    def run(self):
+        rng = random.Random(self.name)
+        self.post('/login', {'username': self.username, 'password': self.password})
+        self.latencies.clear()
+        today = datetime.date.today()
+        while time.time() < self.stop_at:
+            form = {
+                'class_id': rng.choice(self.class_ids),
+                'subject_id': rng.choice(self.subject_ids),
+                'date': str(today - datetime.timedelta(days=rng.randint(0, 30))),
+            }
+            action = rng.random()
+            if action < 0.4:
+                self.post('/attendance', form)
+            elif action < 0.8:
+                # Как в браузере: открыть форму и сохранить её, переключив отметки
+                html = self.post('/attendance', form)
+                if html is not None:
+                    self.post('/attendance', dict(form, submit_attendance='1', **attendance_changes(html)))
+            else:
+                self.post('/reports', {
+                    'class_id': form['class_id'], 'subject_id': form['subject_id'],
+                    'start_date': str(today - datetime.timedelta(days=90)), 'end_date': str(today),
+                })
+
+
+def run_round(workers, args, env):
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}',
+         '--log-level', 'warning', 'wsgi:app'],
+        cwd=ROOT, env=env
+    )
+    try:
+        wait_until_up(base_url)
+        stop_at = time.time() + args.duration
+        clients = [
+            Teacher(base_url, args.username, args.password, stop_at,
+                    args.class_ids, args.subject_ids)
+            for _ in range(args.clients)
+        ]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = sorted(latency for client in clients for latency in client.latencies)
+    errors = sum(client.errors for client in clients)
+    if not latencies:
+        print(f'{workers:>8} {"—":>10} {"—":>10} {"—":>10} {errors:>8}')
+        return
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+    print(f'{workers:>8} {len(latencies) / args.duration:>10.1f} '
+          f'{statistics.median(latencies) * 1000:>10.1f} {p95 * 1000:>10.1f} {errors:>8}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--username', default='teacher1')
+    parser.add_argument('--password', default='password123')
+    parser.add_argument('--class-ids', type=int, nargs='+', default=[1, 2, 3, 4, 5, 6])
+    parser.add_argument('--subject-ids', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--database', default=os.path.join(ROOT, 'instance', 'schoolroom.db'),
+                        help='Файл SQLite, копия которого нагружается.')
+    parser.add_argument('--no-copy', action='store_true',
+                        help='Не копировать базу, а использовать DATABASE_URL как есть.')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('SECRET_KEY', 'load-test')
+    tmp = tempfile.mkdtemp()
+    try:
+        if not args.no_copy:
+            path = os.path.join(tmp, 'load.db')
+            shutil.copy(args.database, path)
+            env['DATABASE_URL'] = 'sqlite:///' + path
+        print(f'{"воркеров":>8} {"запр/с":>10} {"p50, мс":>10} {"p95, мс":>10} {"ошибок":>8}')
+        for workers in args.workers:
+            run_round(workers, args, env)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
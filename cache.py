@@ -0,0 +1,180 @@
+"""Кэш справочников: классы, предметы и отсортированные списки учеников.
+
+Эти данные меняются несколько раз в год, а читаются на каждой странице журнала.
+Значения хранятся как лёгкие namedtuple (не ORM-объекты), поэтому их можно
+держать между запросами и передавать через внешний бэкенд.
+
+Бэкенд выбирается настройкой CACHE_BACKEND:
+  'local' — словарь в памяти процесса с LRU-вытеснением (CACHE_MAX_SIZE) и TTL (CACHE_TTL);
+  'redis' — общий для всех воркеров gunicorn кэш по адресу CACHE_REDIS_URL.
+С локальным бэкендом другие воркеры увидят изменения не позже чем через CACHE_TTL секунд.
+Сбрасывается кэш явно из add_class(), add_student(), delete_student() и импорта.
+Предметы в приложении не меняются (их заводит init_db.py), поэтому отдельного
+сброса для них нет.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app, abort
+
+from models import db, Class, Subject, Student
+
+CachedClass = namedtuple('CachedClass', ['id', 'name'])
+CachedSubject = namedtuple('CachedSubject', ['id', 'name'])
+CachedStudent = namedtuple('CachedStudent', ['id', 'full_name', 'class_id'])
+
+_MISSING = object()
+
+
+class LocalCache:
+    """LRU-кэш в памяти процесса с ограничением размера и временем жизни записей."""
+
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    """Кэш в Redis: одна копия на все воркеры, сброс сразу виден всем."""
+
+    def __init__(self, url, ttl=300, prefix='webschool:'):
+        import redis  # необязательная зависимость, нужна только этому бэкенду
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        return _MISSING if raw is None else pickle.loads(raw)
+
+    def set(self, key, value):
+        self._client.set(self.prefix + key, pickle.dumps(value), ex=self.ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        keys = list(self._client.scan_iter(self.prefix + '*'))
+        if keys:
+            self._client.delete(*keys)
+
+
+def init_cache(app):
+    backend = app.config.get('CACHE_BACKEND', 'local')
+    ttl = app.config.get('CACHE_TTL', 300)
+    if backend == 'redis':
+        cache = RedisCache(app.config['CACHE_REDIS_URL'], ttl=ttl)
+    else:
+        cache = LocalCache(max_size=app.config.get('CACHE_MAX_SIZE', 1024), ttl=ttl)
+    app.extensions['reference_cache'] = cache
+    return cache
+
+
+def _backend():
+    return current_app.extensions['reference_cache']
+
+
+def _cached(key, load):
+    cache = _backend()
+    value = cache.get(key)
+    if value is _MISSING:
+        value = load()
+        cache.set(key, value)
+    return value
+
+
+def remember(key, load):
+    """Значение по ключу из кэша; при промахе вычисляется load() и сохраняется.
+
+    Ключ должен включать версию данных: такие записи не сбрасываются явно,
+    а вытесняются по TTL и размеру кэша.
+    """
+    return _cached(key, load)
+
+
+def get_classes():
+    return _cached('classes', lambda: [
+        CachedClass(class_.id, class_.name) for class_ in Class.query.order_by(Class.id)
+    ])
+
+
+def get_subjects():
+    return _cached('subjects', lambda: [
+        CachedSubject(subject.id, subject.name) for subject in Subject.query.order_by(Subject.id)
+    ])
+
+
+def get_class(class_id):
+    """Класс по id из кэша или None."""
+    class_id = int(class_id)
+    return next((class_ for class_ in get_classes() if class_.id == class_id), None)
+
+
+def get_subject(subject_id):
+    subject_id = int(subject_id)
+    return next((subject for subject in get_subjects() if subject.id == subject_id), None)
+
+
+def get_class_or_404(class_id):
+    class_ = get_class(class_id)
+    if class_ is None:
+        abort(404)
+    return class_
+
+
+def get_subject_or_404(subject_id):
+    subject = get_subject(subject_id)
+    if subject is None:
+        abort(404)
+    return subject
+
+
+def get_roster(class_id):
+    """Ученики класса, отсортированные по ФИО."""
+    class_id = int(class_id)
+    return _cached(f'roster:{class_id}', lambda: [
+        CachedStudent(*row) for row in db.session.query(
+            Student.id, Student.full_name, Student.class_id
+        ).filter(Student.class_id == class_id).order_by(Student.full_name, Student.id)
+    ])
+
+
+def invalidate_classes():
+    _backend().delete('classes')
+
+
+def invalidate_roster(*class_ids):
+    _backend().delete(*(f'roster:{int(class_id)}' for class_id in class_ids if class_id is not None))
@@ -0,0 +1,121 @@
+"""Команды flask для обслуживания базы: flask --app app <команда>.
+
+    init-db          создать таблицы и применить миграции (upgrade-db — то же самое)
+    export-term      выгрузить отчёты школы за период в ZIP
+    rebuild-summary  пересобрать и сверить сводки журнала
+    archive-year     перенести закрытый учебный год в архивный файл
+    import-data      импортировать учеников, оценки или посещаемость из CSV/XLSX
+"""
+import os
+
+import click
+from flask.cli import with_appcontext
+
+from models import db
+from migrations import upgrade_database
+from pdf_export import FONT_PATH
+from batch_export import collect_entries, iter_zip
+from importer import KINDS as IMPORT_KINDS, ImportFormatError, import_file
+import summary
+import archive
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Создаёт недостающие таблицы и применяет миграции схемы.
+
+    Безопасно повторять на существующей базе; доступна и под старым именем upgrade-db.
+    """
+    db.create_all()
+    applied = upgrade_database()
+    print(f"Применены миграции: {applied}" if applied else "Схема базы данных актуальна.")
+
+@click.command('export-term')
+@click.argument('start_date', metavar='START_DATE', type=click.DateTime(formats=['%Y-%m-%d']))
+@click.argument('end_date', metavar='END_DATE', type=click.DateTime(formats=['%Y-%m-%d']))
+@click.option('--output', '-o', default=None, help='Путь к ZIP-архиву.')
+@click.option('--workers', '-w', type=int, default=None, help='Число процессов для рендера PDF.')
+@with_appcontext
+def export_term_command(start_date, end_date, output, workers):
+    """Выгружает отчёты по всем классам и предметам за период в один ZIP."""
+    start_date = start_date.date()
+    end_date = end_date.date()
+    output = output or f'reports_{start_date}_{end_date}.zip'
+    entries = collect_entries(start_date, end_date)
+    with open(output, 'wb') as f:
+        for chunk in iter_zip(entries, FONT_PATH, workers):
+            f.write(chunk)
+    print(f"Сохранено отчётов: {len(entries)} в {output}")
+
+@click.command('rebuild-summary')
+@click.option('--check-only', is_flag=True, help='Только сверить сводки с журналом.')
+@with_appcontext
+def rebuild_summary_command(check_only):
+    """Пересобирает недельные сводки из журнала и сверяет их с сырыми записями."""
+    if not check_only:
+        counts = summary.rebuild()
+        db.session.commit()
+        print(f"Сводки пересобраны: {counts}")
+    mismatches = summary.check()
+    for table, key, expected, stored in mismatches[:20]:
+        print(f"{table} {key}: в журнале {expected}, в сводке {stored}")
+    if mismatches:
+        raise click.ClickException(f"Расхождений: {len(mismatches)}")
+    print("Сводки совпадают с журналом.")
+
+@click.command('archive-year')
+@click.argument('year', type=int)
+@click.option('--no-vacuum', is_flag=True, help='Не сжимать рабочую базу после переноса.')
+@with_appcontext
+def archive_year_command(year, no_vacuum):
+    """Переносит закрытый учебный год (YEAR — год его начала) в архивный файл."""
+    try:
+        result = archive.archive_year(year, vacuum=not no_vacuum)
+    except archive.ArchiveError as e:
+        raise click.ClickException(str(e))
+    mb = 1024 * 1024
+    print(f"Учебный год {year}/{year + 1}: перенесено посещаемости {result.attendance_rows}, "
+          f"оценок {result.grade_rows} в {result.path}")
+    print(f"Рабочая база: {result.size_before / mb:.1f} МБ -> {result.size_after / mb:.1f} МБ, "
+          f"архив: {result.archive_size / mb:.1f} МБ")
+    print("Время: " + ", ".join(f"{step} {seconds:.2f} с" for step, seconds in result.timings.items()))
+
+@click.command('import-data')
+@click.argument('kind', type=click.Choice(IMPORT_KINDS))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--errors', 'errors_path', default=None, help='Куда записать строки с ошибками (CSV).')
+@click.option('--chunk-size', type=int, default=1000, help='Строк в одной транзакции.')
+@with_appcontext
+def import_data_command(kind, path, errors_path, chunk_size):
+    """Импортирует учеников, оценки или посещаемость из CSV/XLSX."""
+    errors_path = errors_path or os.path.splitext(path)[0] + '.errors.csv'
+
+    def progress(rows, imported, errors, seconds):
+        rate = rows / seconds if seconds else 0
+        click.echo(f"\rстрок: {rows}, импортировано: {imported}, ошибок: {errors}, {rate:.0f} строк/с", nl=False)
+
+    try:
+        with open(path, 'rb') as stream, open(errors_path, 'w', encoding='utf-8-sig', newline='') as error_stream:
+            result = import_file(stream, path, kind, error_stream, progress, chunk_size)
+    except ImportFormatError as e:
+        os.remove(errors_path)
+        raise click.ClickException(str(e))
+    except Exception:
+        os.remove(errors_path)
+        raise
+    click.echo()
+    rate = result.rows / result.seconds if result.seconds else 0
+    print(f"Готово за {result.seconds:.1f} с ({rate:.0f} строк/с): "
+          f"импортировано {result.imported}, ошибок {result.errors}")
+    if result.errors:
+        print(f"Строки с ошибками: {errors_path}")
+    else:
+        os.remove(errors_path)
+
+
+def init_app(app):
+    for command in (init_db_command, export_term_command, rebuild_summary_command,
+                    archive_year_command, import_data_command):
+        app.cli.add_command(command)
+    app.cli.add_command(init_db_command, 'upgrade-db')
@@ -0,0 +1,139 @@
+"""Общешкольная сводка посещаемости.
+
+Главная страница читает только дневную сводку attendance_daily — по строке на
+(день, класс, предмет), то есть несколько сотен строк за неделю на всю школу, —
+и раскладывает пропуски по дням, классам и предметам. Страница класса берёт ту же
+сводку и недельные сводки учеников (summary.attendance_totals), страница ученика —
+его собственные отметки по индексу (student_id, subject_id, date).
+"""
+import datetime
+
+from flask import Blueprint, render_template, request, abort
+
+from models import db, Student, Attendance, AttendanceDaily
+from summary import attendance_totals
+from auth import login_required
+import cache
+
+dashboard = Blueprint('dashboard', __name__, url_prefix='/dashboard')
+
+
+def _period():
+    """Период из параметров start/end; по умолчанию — текущая неделя по сегодняшний день."""
+    today = datetime.date.today()
+    start = today - datetime.timedelta(days=today.weekday())
+    end = today
+    try:
+        if request.args.get('start'):
+            start = datetime.datetime.strptime(request.args['start'], '%Y-%m-%d').date()
+        if request.args.get('end'):
+            end = datetime.datetime.strptime(request.args['end'], '%Y-%m-%d').date()
+    except ValueError:
+        pass
+    if end < start:
+        start, end = end, start
+    return start, end
+
+
+def _rate(absent, total):
+    return round(absent / total * 100, 1) if total else None
+
+
+def _add(totals, key, present, total):
+    absent_sum, total_sum = totals.get(key, (0, 0))
+    totals[key] = (absent_sum + total - present, total_sum + total)
+
+
+def _daily_rows(start, end, class_id=None):
+    query = db.session.query(
+        AttendanceDaily.day, AttendanceDaily.class_id, AttendanceDaily.subject_id,
+        AttendanceDaily.present_count, AttendanceDaily.total_count
+    ).filter(AttendanceDaily.day >= start, AttendanceDaily.day <= end)
+    if class_id is not None:
+        query = query.filter(AttendanceDaily.class_id == class_id)
+    return query.all()
+
+
+@dashboard.route('/')
+@login_required
+def overview():
+    start, end = _period()
+    by_day, by_class, by_subject, by_class_day = {}, {}, {}, {}
+    for day, class_id, subject_id, present, total in _daily_rows(start, end):
+        _add(by_day, day, present, total)
+        _add(by_class, class_id, present, total)
+        _add(by_subject, subject_id, present, total)
+        _add(by_class_day, (class_id, day), present, total)
+
+    classes = [class_ for class_ in cache.get_classes() if class_.id in by_class]
+    # Сначала классы с наибольшей долей пропусков
+    classes.sort(key=lambda class_: -(by_class[class_.id][0] / by_class[class_.id][1]))
+    return render_template(
+        'dashboard.html',
+        start=start, end=end,
+        days=sorted(by_day),
+        classes=classes,
+        subjects=[subject for subject in cache.get_subjects() if subject.id in by_subject],
+        by_day=by_day, by_class=by_class, by_subject=by_subject, by_class_day=by_class_day,
+        total=tuple(map(sum, zip(*by_day.values()))) if by_day else (0, 0),
+        rate=_rate
+    )
+
+
+@dashboard.route('/class/<int:class_id>')
+@login_required
+def class_view(class_id):
+    class_ = cache.get_class_or_404(class_id)
+    start, end = _period()
+    by_day_subject, by_day = {}, {}
+    for day, _, subject_id, present, total in _daily_rows(start, end, class_id):
+        _add(by_day_subject, (day, subject_id), present, total)
+        _add(by_day, day, present, total)
+
+    students = cache.get_roster(class_id)
+    by_student_subject, by_student = {}, {}
+    if students:
+        totals = attendance_totals(start, end, [student.id for student in students])
+        for (student_id, subject_id), (total, present) in totals.items():
+            _add(by_student_subject, (student_id, subject_id), present, total)
+            _add(by_student, student_id, present, total)
+
+    return render_template(
+        'dashboard_class.html',
+        class_=class_, start=start, end=end,
+        days=sorted(by_day),
+        subjects=cache.get_subjects(),
+        students=students,
+        by_day=by_day, by_day_subject=by_day_subject,
+        by_student=by_student, by_student_subject=by_student_subject,
+        rate=_rate
+    )
+
+
+@dashboard.route('/student/<int:student_id>')
+@login_required
+def student_view(student_id):
+    student = db.session.get(Student, student_id)
+    if student is None:
+        abort(404)
+    start, end = _period()
+    absences = db.session.query(Attendance.date, Attendance.subject_id).filter(
+        Attendance.student_id == student_id,
+        Attendance.date >= start,
+        Attendance.date <= end,
+        Attendance.present == False  # noqa: E712
+    ).order_by(Attendance.date, Attendance.subject_id).all()
+    by_subject = {}
+    for (_, subject_id), (total, present) in attendance_totals(start, end, [student_id]).items():
+        _add(by_subject, subject_id, present, total)
+
+    return render_template(
+        'dashboard_student.html',
+        student=student, class_=cache.get_class(student.class_id) if student.class_id else None,
+        start=start, end=end,
+        absences=absences,
+        subjects=cache.get_subjects(),
+        subject_names={subject.id: subject.name for subject in cache.get_subjects()},
+        by_subject=by_subject,
+        rate=_rate
+    )
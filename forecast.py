@@ -0,0 +1,188 @@
+"""Прогноз средней оценки и посещаемости на конец четверти.
+
+Для каждой пары (ученик, предмет) по истории оценок и посещаемости строится
+линейный тренд. Параметры считаются пачками через NumPy по всей школе и
+хранятся в кэше процесса вместе с ревизией журнала, по которую они актуальны.
+Каждый запрос читает только номер ревизии; если журнал менялся, пересчитываются
+лишь ученики, записанные в journal_change после этой ревизии (см. bump_revision).
+"""
+import datetime
+import threading
+
+import numpy as np
+from sqlalchemy import select
+
+from models import db, Attendance, Grade
+from journal import current_revision, changed_since
+
+# Конец каждой четверти (месяц, день); после последней прогноз строится на следующую
+TERM_ENDS = [(10, 31), (12, 28), (3, 22), (5, 31)]
+GRADE_MIN, GRADE_MAX = 2, 5
+# До стольких учеников записи выбираются по списку id; если изменились данные
+# большего числа учеников, читается вся таблица и лишние отбрасываются в NumPy.
+# Так запросов на таблицу всегда один, сколько бы учеников ни было в школе
+IN_LIMIT = 500
+# Строки читаются порциями и сразу складываются в массивы, чтобы память не росла
+# вместе с журналом
+STREAM_BATCH = 20000
+# Дни считаются от этой даты, чтобы суммы квадратов не теряли точность
+EPOCH = datetime.date(2000, 1, 1).toordinal()
+
+# Поля накопленной статистики по паре (ученик, предмет)
+STAT_FIELDS = ('n', 'sx', 'sy', 'sxx', 'sxy', 'first', 'last')
+
+_lock = threading.Lock()
+# {student_id: {'grades': {subject_id: stats}, 'attendance': {subject_id: stats}}}
+_cache = {}
+# База и ревизия журнала, по которую актуален _cache
+_cached_at = {'database': None, 'revision': None}
+
+
+def default_term_end(today=None):
+    """Ближайший конец четверти не раньше сегодняшнего дня."""
+    today = today or datetime.date.today()
+    candidates = []
+    for year in (today.year, today.year + 1):
+        for month, day in TERM_ENDS:
+            candidates.append(datetime.date(year, month, day))
+    return min(candidate for candidate in candidates if candidate >= today)
+
+
+def _fit(student_ids, subject_ids, days, values):
+    """Накопленные суммы для МНК по группам (ученик, предмет), без цикла по записям."""
+    if len(values) == 0:
+        return {}
+    keys = np.stack([student_ids, subject_ids], axis=1)
+    groups, index = np.unique(keys, axis=0, return_inverse=True)
+    index = index.ravel()
+    size = len(groups)
+    x = days.astype(np.float64)
+    y = values.astype(np.float64)
+    n = np.bincount(index, minlength=size)
+    sx = np.bincount(index, weights=x, minlength=size)
+    sy = np.bincount(index, weights=y, minlength=size)
+    sxx = np.bincount(index, weights=x * x, minlength=size)
+    sxy = np.bincount(index, weights=x * y, minlength=size)
+    first = np.full(size, np.inf)
+    np.minimum.at(first, index, x)
+    last = np.full(size, -np.inf)
+    np.maximum.at(last, index, x)
+
+    stats = {}
+    for i, (student_id, subject_id) in enumerate(groups.tolist()):
+        stats.setdefault(student_id, {})[subject_id] = (
+            n[i], sx[i], sy[i], sxx[i], sxy[i], first[i], last[i]
+        )
+    return stats
+
+
+def _load_stats(model, value_column, student_ids):
+    """Статистика по ученикам student_ids (None — по всем) одним запросом к таблице model."""
+    if student_ids is not None and not student_ids:
+        return {}
+    stmt = select(model.student_id, model.subject_id, model.date, value_column).where(model.date.isnot(None))
+    wanted = None
+    if student_ids is not None and len(student_ids) <= IN_LIMIT:
+        stmt = stmt.where(model.student_id.in_(student_ids))
+    elif student_ids is not None:
+        wanted = np.asarray(student_ids, dtype=np.int64)
+    parts = []
+    result = db.session.execute(stmt.execution_options(yield_per=STREAM_BATCH))
+    for rows in result.partitions():
+        students, subjects, dates, values = zip(*rows)
+        columns = (
+            np.asarray(students, dtype=np.int64),
+            np.asarray(subjects, dtype=np.int64),
+            np.fromiter((date.toordinal() - EPOCH for date in dates), dtype=np.int64, count=len(dates)),
+            np.asarray(values, dtype=np.float64),
+        )
+        if wanted is not None:
+            keep = np.isin(columns[0], wanted)
+            columns = tuple(column[keep] for column in columns)
+        parts.append(columns)
+    if not parts:
+        return {}
+    return _fit(*(np.concatenate(column) for column in zip(*parts)))
+
+
+def refresh_cache():
+    """Пересчитывает параметры учеников, изменившихся с прошлого вызова. Возвращает их число."""
+    database = str(db.engine.url)
+    revision, _ = current_revision()
+    with _lock:
+        seen = _cached_at['revision']
+        if _cached_at['database'] == database and seen == revision:
+            return 0
+        if _cached_at['database'] != database or seen is None or seen > revision:
+            # Первый запрос процесса или другая база: считаем всех
+            _cache.clear()
+            student_ids = None
+        else:
+            student_ids = sorted(changed_since(seen))
+        grade_stats = _load_stats(Grade, Grade.value, student_ids)
+        attendance_stats = _load_stats(Attendance, Attendance.present, student_ids)
+        if student_ids is None:
+            student_ids = set(grade_stats) | set(attendance_stats)
+        for student_id in student_ids:
+            grades = grade_stats.get(student_id, {})
+            attendance = attendance_stats.get(student_id, {})
+            if grades or attendance:
+                _cache[student_id] = {'grades': grades, 'attendance': attendance}
+            else:
+                # Ученика удалили или его записи ушли в архив
+                _cache.pop(student_id, None)
+        _cached_at.update(database=database, revision=revision)
+    return len(student_ids)
+
+
+def _predict(stats, term_end, low, high):
+    """Ожидаемое среднее к концу четверти: факт плюс продолжение тренда до term_end.
+
+    Будущих записей ожидается столько же в день, сколько было до сих пор;
+    их значения берутся с линии тренда и ограничиваются диапазоном [low, high].
+    """
+    n, sx, sy, sxx, sxy, first, last = (stats[:, i] for i in range(len(STAT_FIELDS)))
+    mean = sy / n
+    denominator = n * sxx - sx * sx
+    has_trend = (n >= 2) & (denominator > 0)
+    slope = np.where(has_trend, (n * sxy - sx * sy) / np.where(has_trend, denominator, 1), 0.0)
+    intercept = mean - slope * (sx / n)
+
+    end = float(term_end.toordinal() - EPOCH)
+    remaining = np.maximum(end - last, 0)
+    rate = n / np.maximum(last - first + 1, 1)
+    future_count = rate * remaining
+    # Среднее значение линии тренда на оставшемся отрезке [last, end]
+    future_mean = np.clip(intercept + slope * (last + np.maximum(end, last)) / 2, low, high)
+    return (sy + future_count * future_mean) / (n + future_count)
+
+
+def forecast_school(students, subjects, term_end):
+    """Возвращает {student_id: {subject_id: (оценка или None, посещаемость % или None)}}."""
+    refresh_cache()
+    subject_ids = [subject.id for subject in subjects]
+    keys, grade_stats, attendance_keys, attendance_stats = [], [], [], []
+    with _lock:
+        for student in students:
+            cached = _cache.get(student.id)
+            if not cached:
+                continue
+            for subject_id in subject_ids:
+                if subject_id in cached['grades']:
+                    keys.append((student.id, subject_id))
+                    grade_stats.append(cached['grades'][subject_id])
+                if subject_id in cached['attendance']:
+                    attendance_keys.append((student.id, subject_id))
+                    attendance_stats.append(cached['attendance'][subject_id])
+
+    result = {}
+    if grade_stats:
+        predicted = _predict(np.array(grade_stats, dtype=np.float64), term_end, GRADE_MIN, GRADE_MAX)
+        for (student_id, subject_id), value in zip(keys, predicted.tolist()):
+            result.setdefault(student_id, {})[subject_id] = (round(value, 2), None)
+    if attendance_stats:
+        predicted = _predict(np.array(attendance_stats, dtype=np.float64), term_end, 0.0, 1.0)
+        for (student_id, subject_id), value in zip(attendance_keys, predicted.tolist()):
+            grade, _ = result.setdefault(student_id, {}).get(subject_id, (None, None))
+            result[student_id][subject_id] = (grade, round(value * 100, 1))
+    return result
@@ -0,0 +1,350 @@
+"""Массовый импорт учеников, оценок и посещаемости из CSV и XLSX.
+
+Файл читается потоково, порциями по CHUNK_SIZE строк, поэтому память не зависит
+от его размера. Для каждой порции:
+  * названия классов и предметов и ученики (класс + ФИО) ищутся пачкой, одним
+    запросом на каждый вид, с запоминанием уже найденных между порциями;
+  * строки проверяются, ошибочные уходят в файл ошибок с номером строки и причиной;
+  * правильные вставляются одним executemany (журнал — upsert по ученику, предмету
+    и дате), после чего пересчитываются недельные сводки и порция коммитится.
+Так транзакции остаются короткими и не держат блокировку записи SQLite надолго.
+
+Колонки (заголовок в первой строке, регистр не важен):
+  students    класс, фио
+  grades      класс, фио, предмет, дата, оценка
+  attendance  класс, фио, предмет, дата, присутствие (1/0, да/нет, +/-)
+"""
+import codecs
+import csv
+import io
+import time
+from collections import namedtuple
+from datetime import datetime, date
+
+from sqlalchemy import insert
+
+from models import db, Class, Subject, Student, Attendance, Grade
+from journal import upsert_journal, bump_revision
+import summary
+import archive
+import cache
+
+CHUNK_SIZE = 1000
+KINDS = ('students', 'grades', 'attendance')
+GRADE_VALUES = (2, 3, 4, 5)
+
+# Допустимые заголовки колонок
+COLUMNS = {
+    'class': ('class', 'класс'),
+    'full_name': ('full_name', 'фио', 'ученик'),
+    'subject': ('subject', 'предмет'),
+    'date': ('date', 'дата'),
+    'value': ('value', 'grade', 'оценка'),
+    'present': ('present', 'присутствие', 'был'),
+}
+REQUIRED = {
+    'students': ('class', 'full_name'),
+    'grades': ('class', 'full_name', 'subject', 'date', 'value'),
+    'attendance': ('class', 'full_name', 'subject', 'date', 'present'),
+}
+TRUE_VALUES = {'1', 'да', '+', 'true', 'yes', 'y', 'д'}
+FALSE_VALUES = {'0', 'нет', '-', 'false', 'no', 'n', 'н', ''}
+
+ImportResult = namedtuple('ImportResult', ['rows', 'imported', 'errors', 'seconds'])
+
+
+class ImportFormatError(ValueError):
+    """Файл нельзя импортировать целиком: неизвестный формат или нет нужных колонок."""
+
+
+def _csv_encoding(stream):
+    # Excel с русской локалью сохраняет CSV в Windows-1251: если начало файла
+    # не читается как UTF-8, считаем его cp1251
+    sample = stream.read(64 * 1024)
+    stream.seek(0)
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return 'cp1251'
+    return 'utf-8-sig'
+
+
+def _read_csv(stream):
+    encoding = _csv_encoding(stream)
+    text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+    try:
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(text, dialect)
+    except UnicodeDecodeError:
+        raise ImportFormatError(
+            f'Файл не читается в кодировке {"UTF-8" if encoding == "utf-8-sig" else "Windows-1251"}; '
+            'сохраните его как CSV в UTF-8'
+        )
+
+
+def _read_xlsx(stream):
+    try:
+        import openpyxl  # необязательная зависимость, нужна только для XLSX
+    except ImportError:
+        raise ImportFormatError('Для импорта XLSX установите openpyxl')
+    workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ['' if value is None else value for value in row]
+    finally:
+        workbook.close()
+
+
+def read_rows(stream, filename):
+    """Возвращает (номер строки, {колонка: значение}) по строкам файла после заголовка."""
+    if filename.lower().endswith('.xlsx'):
+        rows = _read_xlsx(stream)
+    elif filename.lower().endswith(('.csv', '.txt')):
+        rows = _read_csv(stream)
+    else:
+        raise ImportFormatError('Поддерживаются файлы .csv и .xlsx')
+    header = next(rows, None)
+    if header is None:
+        raise ImportFormatError('Файл пуст')
+    aliases = {alias: column for column, names in COLUMNS.items() for alias in names}
+    columns = [aliases.get(str(name).strip().lower()) for name in header]
+    yield columns
+    for line, row in enumerate(rows, start=2):
+        if not any(str(value).strip() for value in row):
+            continue
+        yield line, {
+            column: value.strip() if isinstance(value, str) else value
+            for column, value in zip(columns, row) if column
+        }
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for fmt in ('%Y-%m-%d', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(str(value), fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f'неверная дата «{value}»')
+
+
+def _parse_grade(value):
+    try:
+        grade = int(float(value)) if not isinstance(value, int) else value
+    except (TypeError, ValueError):
+        grade = None
+    if grade not in GRADE_VALUES:
+        raise ValueError(f'неверная оценка «{value}»')
+    return grade
+
+
+def _parse_present(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f'неверная отметка присутствия «{value}»')
+
+
+class _Resolver:
+    """Ищет классы, предметы и учеников пачками и помнит найденное между порциями."""
+
+    def __init__(self):
+        self.classes = {}
+        self.subjects = {}
+        self.students = {}
+        self.archived = None
+        self.changed_rosters = set()
+        self.changed_students = set()
+
+    def is_archived(self, day):
+        if self.archived is None:
+            self.archived = archive.archived_ranges()
+        return any(start <= day <= end for start, end in self.archived)
+
+    def _load_names(self, model, known, names):
+        missing = {name for name in names if name and name not in known}
+        if missing:
+            for id_, name in db.session.query(model.id, model.name).filter(model.name.in_(missing)):
+                known[name] = id_
+            for name in missing:
+                known.setdefault(name, None)
+
+    def load(self, records):
+        self._load_names(Class, self.classes, {str(r.get('class', '')) for _, r in records})
+        self._load_names(Subject, self.subjects, {str(r.get('subject', '')) for _, r in records})
+
+    def load_students(self, records):
+        wanted = {
+            (self.classes.get(str(r.get('class', ''))), str(r.get('full_name', '')))
+            for _, r in records
+        }
+        missing = {key for key in wanted if key[0] is not None and key not in self.students}
+        if not missing:
+            return
+        class_ids = {class_id for class_id, _ in missing}
+        names = {name for _, name in missing}
+        rows = db.session.query(Student.id, Student.class_id, Student.full_name).filter(
+            Student.class_id.in_(class_ids), Student.full_name.in_(names)
+        ).order_by(Student.id)
+        found = {}
+        for id_, class_id, full_name in rows:
+            found.setdefault((class_id, full_name), []).append(id_)
+        for key in missing:
+            self.students[key] = found.get(key, [])
+
+
+def _import_students(chunk, resolver, errors):
+    resolver.load(chunk)
+    resolver.load_students(chunk)
+    rows = []
+    seen = set()
+    for line, record in chunk:
+        class_id = resolver.classes.get(str(record.get('class', '')))
+        full_name = str(record.get('full_name', ''))
+        if class_id is None:
+            errors.append((line, record, f'класс «{record.get("class", "")}» не найден'))
+        elif not full_name or len(full_name) > 100:
+            errors.append((line, record, 'ФИО пустое или длиннее 100 символов'))
+        elif resolver.students.get((class_id, full_name)) or (class_id, full_name) in seen:
+            errors.append((line, record, 'ученик уже есть в классе'))
+        else:
+            seen.add((class_id, full_name))
+            rows.append({'full_name': full_name, 'class_id': class_id})
+    if rows:
+        db.session.execute(insert(Student), rows)
+        # Списки классов сбрасываются после коммита порции (см. import_file)
+        resolver.changed_rosters.update(row['class_id'] for row in rows)
+        # Новых учеников поищем в базе заново, если они встретятся в следующих порциях
+        for key in seen:
+            resolver.students.pop(key, None)
+    return len(rows)
+
+
+def _import_journal(kind, chunk, resolver, errors):
+    resolver.load(chunk)
+    resolver.load_students(chunk)
+    model, value_column, parse = {
+        'grades': (Grade, 'value', _parse_grade),
+        'attendance': (Attendance, 'present', _parse_present),
+    }[kind]
+    # Повтор в файле той же записи (ученик, предмет, дата) — побеждает последняя строка
+    rows = {}
+    for line, record in chunk:
+        class_id = resolver.classes.get(str(record.get('class', '')))
+        subject_id = resolver.subjects.get(str(record.get('subject', '')))
+        student_ids = resolver.students.get((class_id, str(record.get('full_name', ''))), [])
+        if class_id is None:
+            errors.append((line, record, f'класс «{record.get("class", "")}» не найден'))
+        elif subject_id is None:
+            errors.append((line, record, f'предмет «{record.get("subject", "")}» не найден'))
+        elif not student_ids:
+            errors.append((line, record, 'ученик не найден в классе'))
+        elif len(student_ids) > 1:
+            errors.append((line, record, 'в классе несколько учеников с таким ФИО'))
+        else:
+            try:
+                day = _parse_date(record.get('date', ''))
+                value = parse(record.get(value_column, ''))
+            except ValueError as error:
+                errors.append((line, record, str(error)))
+                continue
+            if resolver.is_archived(day):
+                errors.append((line, record, 'учебный год этой даты перенесён в архив'))
+                continue
+            rows[(student_ids[0], subject_id, day)] = {
+                'student_id': student_ids[0], 'subject_id': subject_id, 'date': day, value_column: value
+            }
+    if not rows:
+        return 0
+    upsert_journal(model, list(rows.values()), [value_column])
+    resolver.changed_students.update(student_id for student_id, _, _ in rows)
+    refresh = summary.refresh_grades if kind == 'grades' else summary.refresh_attendance
+    by_subject = {}
+    for student_id, subject_id, day in rows:
+        students, days = by_subject.setdefault(subject_id, (set(), set()))
+        students.add(student_id)
+        days.add(day)
+    for subject_id, (students, days) in by_subject.items():
+        refresh(students, subject_id, days)
+    return len(rows)
+
+
+def _error_rows(errors):
+    """Строки файла ошибок: номер строки, причина и исходные значения."""
+    for line, record, message in errors:
+        yield [line, message, *(record.get(column, '') for column in COLUMNS)]
+
+
+def import_file(stream, filename, kind, error_stream=None, progress=None, chunk_size=CHUNK_SIZE):
+    """Импортирует файл и возвращает ImportResult.
+
+    stream — бинарный файл (для XLSX — с поддержкой seek), error_stream — текстовый
+    поток для CSV с ошибочными строками, progress(rows, imported, errors, seconds)
+    вызывается после каждой порции.
+    """
+    if kind not in KINDS:
+        raise ImportFormatError(f'Неизвестный вид импорта: {kind}')
+    rows = read_rows(stream, filename)
+    columns = next(rows)
+    missing = [column for column in REQUIRED[kind] if column not in columns]
+    if missing:
+        raise ImportFormatError('Нет колонок: ' + ', '.join(COLUMNS[column][1] for column in missing))
+
+    resolver = _Resolver()
+    started = time.perf_counter()
+    total = imported = error_count = 0
+    error_writer = csv.writer(error_stream) if error_stream is not None else None
+    if error_writer is not None:
+        error_writer.writerow(['строка', 'ошибка', *COLUMNS])
+    for chunk in _chunks(rows, chunk_size):
+        errors = []
+        try:
+            if kind == 'students':
+                count = _import_students(chunk, resolver, errors)
+            else:
+                count = _import_journal(kind, chunk, resolver, errors)
+            if count:
+                bump_revision(resolver.changed_students)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            resolver.changed_rosters.clear()
+            raise
+        finally:
+            resolver.changed_students.clear()
+        # Как и в формах: кэш сбрасывается после коммита, иначе параллельный запрос
+        # успел бы снова положить в него старый список
+        if resolver.changed_rosters:
+            cache.invalidate_roster(*resolver.changed_rosters)
+            resolver.changed_rosters.clear()
+        total += len(chunk)
+        imported += count
+        error_count += len(errors)
+        if error_writer is not None:
+            error_writer.writerows(_error_rows(errors))
+        if progress is not None:
+            progress(total, imported, error_count, time.perf_counter() - started)
+    return ImportResult(total, imported, error_count, time.perf_counter() - started)
@@ -1,10 +1,21 @@
-from app import app, db
-from app import Class, Subject, Teacher, Student
+from sqlalchemy import text
+
+from app import create_app
+from models import db, Class, Subject, Teacher, Student
+from migrations import upgrade_database
+from auth import hash_password
+
+app = create_app()
 
 with app.app_context():
-    # Очистка и создание таблиц
+    # Очистка и создание таблиц. Поисковую таблицу student_search drop_all() не знает:
+    # удаляем её и сбрасываем версию схемы, чтобы upgrade_database() создал её заново
     db.drop_all()
+    db.session.execute(text('DROP TABLE IF EXISTS student_search'))
+    db.session.execute(text('PRAGMA user_version = 0'))
+    db.session.commit()
     db.create_all()
+    upgrade_database()
 
     # Добавление тестовых данных
     # Сначала создаём классы
@@ -28,7 +39,7 @@ with app.app_context():
     ]
 
     # Создаём учителя
-    teacher = Teacher(username='teacher1', password='password123', full_name='Иванов Иван Иванович')
+    teacher = Teacher(username='teacher1', password=hash_password('password123'), full_name='Иванов Иван Иванович')
 
     # Добавляем учеников в классы
     students = [
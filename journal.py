@@ -0,0 +1,151 @@
+"""Пакетное чтение и запись журнала (посещаемость и оценки).
+
+Формы посещаемости и оценок работают сразу со всем классом, поэтому записи
+загружаются одним запросом на класс, предмет и дату. Сохраняются только
+изменённые ячейки: новые записи — одним INSERT ... ON CONFLICT DO NOTHING,
+изменения существующих — одним UPDATE с проверкой номера версии каждой строки. Если запись успели
+изменить или создать с другой формы, ячейка не пишется и возвращается как конфликт.
+Импорт пишет пачками через upsert и тоже увеличивает версию.
+"""
+from datetime import datetime
+
+from sqlalchemy import update, case, or_, and_
+
+from models import db, dialect_insert, Attendance, Grade, JournalRevision, JournalChange
+import summary
+
+JOURNAL_KEY = ('student_id', 'subject_id', 'date')
+
+
+def bump_revision(student_ids=()):
+    """Отмечает изменение журнала. Выполняется в транзакции вызывающего.
+
+    student_ids — ученики, чьи оценки или посещаемость изменились: для них
+    запоминается номер новой ревизии (journal_change).
+    """
+    now = datetime.utcnow().replace(microsecond=0)
+    revision = db.session.execute(
+        update(JournalRevision).where(JournalRevision.id == 1).values(
+            revision=JournalRevision.revision + 1, updated_at=now
+        ).returning(JournalRevision.revision).execution_options(synchronize_session=False)
+    ).scalar()
+    if revision is None:
+        revision = 1
+        db.session.add(JournalRevision(id=1, revision=revision, updated_at=now))
+    if student_ids:
+        stmt = dialect_insert(JournalChange)
+        db.session.execute(
+            stmt.on_conflict_do_update(index_elements=['student_id'], set_={'revision': stmt.excluded.revision}),
+            [{'student_id': student_id, 'revision': revision} for student_id in student_ids]
+        )
+
+
+def changed_since(revision):
+    """Ученики, чьи записи менялись после ревизии revision."""
+    return [student_id for (student_id,) in db.session.query(JournalChange.student_id).filter(
+        JournalChange.revision > revision
+    )]
+
+
+def current_revision():
+    """Возвращает (номер ревизии, время изменения) одним запросом по первичному ключу."""
+    row = db.session.query(JournalRevision.revision, JournalRevision.updated_at).filter_by(id=1).first()
+    if row is None:
+        return 0, datetime(2000, 1, 1)
+    return row.revision, row.updated_at
+
+
+def _load(model, student_ids, subject_id, date):
+    if not student_ids:
+        return {}
+    records = model.query.filter(
+        model.student_id.in_(student_ids),
+        model.subject_id == subject_id,
+        model.date == date
+    ).all()
+    loaded = {student_id: None for student_id in student_ids}
+    loaded.update({record.student_id: record for record in records})
+    return loaded
+
+
+def load_attendance(student_ids, subject_id, date):
+    """Возвращает {student_id: Attendance или None} для класса за дату одним запросом."""
+    return _load(Attendance, student_ids, subject_id, date)
+
+
+def load_grades(student_ids, subject_id, date):
+    """Возвращает {student_id: Grade или None} для класса за дату одним запросом."""
+    return _load(Grade, student_ids, subject_id, date)
+
+
+def upsert_journal(model, rows, update_columns):
+    """Вставляет записи журнала пачкой, а существующие (ученик, предмет, дата) обновляет.
+
+    Версия обновлённой записи растёт, так что открытые формы увидят конфликт.
+    Используется импортом; коммит остаётся за вызывающим.
+    """
+    if not rows:
+        return
+    stmt = dialect_insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(JOURNAL_KEY),
+        set_=dict(
+            {column: stmt.excluded[column] for column in update_columns},
+            version=model.__table__.c.version + 1
+        )
+    )
+    db.session.execute(stmt, rows)
+
+
+def _apply(model, column, subject_id, date, changes):
+    """Применяет изменения {student_id: (значение, версия)}; версия 0 — записи не было.
+
+    Возвращает (применённые student_id, конфликтные student_id).
+    """
+    applied, conflicts = set(), set()
+    new = {student_id: value for student_id, (value, version) in changes.items() if not version}
+    if new:
+        stmt = dialect_insert(model).values([
+            {'student_id': student_id, 'subject_id': subject_id, 'date': date, column: value, 'version': 1}
+            for student_id, value in new.items()
+        ]).on_conflict_do_nothing(index_elements=list(JOURNAL_KEY)).returning(model.student_id)
+        inserted = set(db.session.execute(stmt).scalars())
+        applied |= inserted
+        conflicts |= set(new) - inserted
+    versions = {student_id: version for student_id, (value, version) in changes.items() if version}
+    if versions:
+        # Все изменения одним UPDATE: строка обновится, только если её версия не изменилась
+        stmt = update(model).where(
+            model.subject_id == subject_id,
+            model.date == date,
+            or_(*(and_(model.student_id == student_id, model.version == version)
+                  for student_id, version in versions.items()))
+        ).values({
+            column: case({student_id: changes[student_id][0] for student_id in versions}, value=model.student_id),
+            'version': model.version + 1,
+        }).returning(model.student_id).execution_options(synchronize_session=False)
+        updated = set(db.session.execute(stmt).scalars())
+        applied |= updated
+        conflicts |= set(versions) - updated
+    return applied, conflicts
+
+
+def apply_attendance(subject_id, date, changes):
+    """Сохраняет изменённые отметки {student_id: (present, версия)}. Коммит остаётся за вызывающим.
+
+    Возвращает (применённые student_id, конфликтные student_id).
+    """
+    applied, conflicts = _apply(Attendance, 'present', subject_id, date, changes)
+    if applied:
+        summary.refresh_attendance(applied, subject_id, [date])
+        bump_revision(applied)
+    return applied, conflicts
+
+
+def apply_grades(subject_id, date, changes):
+    """Сохраняет изменённые оценки {student_id: (value, версия)}. Коммит остаётся за вызывающим."""
+    applied, conflicts = _apply(Grade, 'value', subject_id, date, changes)
+    if applied:
+        summary.refresh_grades(applied, subject_id, [date])
+        bump_revision(applied)
+    return applied, conflicts
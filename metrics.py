@@ -0,0 +1,262 @@
+"""Метрики запросов: число и время SQL, время рендера шаблонов, размер ответа.
+
+Счётчики собираются по событиям SQLAlchemy и сигналам Flask, копятся в процессе
+по эндпоинтам и отдаются на /metrics в текстовом формате Prometheus. SQL-выражения
+считаются по событиям движка (before/after_cursor_execute), а время запросов через
+db.session замеряется в do_orm_execute до полного чтения результата: SQLite делает
+основную работу, пока строки выбираются, а не в cursor.execute(). Под gunicorn у каждого воркера свои счётчики;
+Prometheus складывает их по метке instance, если воркеры опрашиваются по отдельности,
+иначе каждый опрос показывает один из воркеров. У потоковых ответов (NDJSON,
+ZIP) учитывается только подготовка ответа: тело отдаётся уже после подсчёта.
+
+Запросы дольше SLOW_REQUEST_MS пишутся в журнал 'webschool.slow' одной строкой
+JSON с самыми долгими SQL-выражениями.
+
+QUERY_BUDGETS задаёт для эндпоинтов предельное число SQL-выражений на запрос.
+В режиме тестирования (app.testing или QUERY_BUDGET_ENFORCE) превышение
+поднимает QueryBudgetExceeded, так что N+1 ловится прогоном тестов и замеров;
+в работе превышение только пишется в журнал. Если задан METRICS_TOKEN, /metrics
+требует заголовок Authorization: Bearer <токен>.
+"""
+import hmac
+import json
+import logging
+import threading
+import time
+
+from flask import g, request, has_request_context, abort, Response, template_rendered, before_render_template
+from sqlalchemy import event
+
+from models import db
+
+# Параметры выполнения, при которых строки читаются порциями: такой результат нельзя
+# буферизовать целиком ради замера, его время учитывается только на cursor.execute()
+STREAMING_OPTIONS = ('yield_per', 'stream_results')
+
+# Границы корзин гистограммы длительности запроса, секунды
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SLOWEST_STATEMENTS = 5
+STATEMENT_PREVIEW = 500
+
+slow_log = logging.getLogger('webschool.slow')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Запрос выполнил больше SQL-выражений, чем разрешено для эндпоинта."""
+
+
+class _Endpoint:
+    __slots__ = ('requests', 'duration', 'buckets', 'queries', 'sql_time', 'render_time', 'response_bytes')
+
+    def __init__(self):
+        self.requests = {}  # (метод, статус) -> число
+        self.duration = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.queries = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.response_bytes = 0
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def observe(self, endpoint, method, status, duration, queries, sql_time, render_time, size):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = _Endpoint()
+            key = (method, status)
+            stats.requests[key] = stats.requests.get(key, 0) + 1
+            stats.duration += duration
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats.buckets[index] += 1
+            stats.queries += queries
+            stats.sql_time += sql_time
+            stats.render_time += render_time
+            stats.response_bytes += size
+
+    def render(self):
+        """Счётчики в текстовом формате Prometheus."""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            family('webschool_requests_total', 'counter', 'Обработано запросов.')
+            for endpoint, stats in endpoints:
+                for (method, status), count in sorted(stats.requests.items()):
+                    lines.append(f'webschool_requests_total{{endpoint="{endpoint}",method="{method}",'
+                                 f'status="{status}"}} {count}')
+
+            family('webschool_request_duration_seconds', 'histogram', 'Время обработки запроса.')
+            for endpoint, stats in endpoints:
+                total = sum(stats.requests.values())
+                for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                    lines.append(f'webschool_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+                lines.append(f'webschool_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {total}')
+                lines.append(f'webschool_request_duration_seconds_sum{{endpoint="{endpoint}"}} {stats.duration:.6f}')
+                lines.append(f'webschool_request_duration_seconds_count{{endpoint="{endpoint}"}} {total}')
+
+            for name, attribute, help_text in (
+                ('webschool_sql_queries_total', 'queries', 'Выполнено SQL-выражений.'),
+                ('webschool_sql_duration_seconds_total', 'sql_time', 'Время выполнения SQL.'),
+                ('webschool_render_duration_seconds_total', 'render_time', 'Время рендера шаблонов.'),
+                ('webschool_response_bytes_total', 'response_bytes', 'Отдано байт в телах ответов.'),
+            ):
+                family(name, 'counter', help_text)
+                for endpoint, stats in endpoints:
+                    value = getattr(stats, attribute)
+                    value = f'{value:.6f}' if isinstance(value, float) else value
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _state():
+    """Счётчики текущего запроса или None вне запроса (CLI, фоновые задачи)."""
+    if not has_request_context():
+        return None
+    return g.get('_metrics')
+
+
+def _record_time(state, elapsed, statement):
+    state['sql_time'] += elapsed
+    slowest = state['statements']
+    slowest.append((elapsed, statement))
+    if len(slowest) > SLOWEST_STATEMENTS:
+        slowest.sort(key=lambda item: item[0], reverse=True)
+        slowest.pop()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _state() is not None:
+        conn.info.setdefault('_metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    state = _state()
+    started = conn.info.get('_metrics_started')
+    if state is None or not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    state['queries'] += 1
+    if state['orm_statements'] is not None:
+        # Выражение выполняется внутри db.session.execute(): время замерит _orm_execute
+        state['orm_statements'].append(statement)
+    else:
+        _record_time(state, elapsed, statement)
+
+
+def _orm_execute(orm_execute_state):
+    """Замеряет выражение через db.session вместе с чтением всех строк результата."""
+    state = _state()
+    if (state is None or state['orm_statements'] is not None
+            or any(option in orm_execute_state.execution_options for option in STREAMING_OPTIONS)):
+        # Вне запроса, вложенная загрузка связей (её время входит во внешний замер)
+        # или потоковое чтение — выполняем как обычно
+        return None
+    if orm_execute_state.is_orm_statement:
+        # ORM сразу выбирает все строки курсора, без копии результата
+        orm_execute_state.update_execution_options(prebuffer_rows=True)
+    statements = state['orm_statements'] = []
+    started = time.perf_counter()
+    try:
+        result = orm_execute_state.invoke_statement()
+        # Текстовый SQL буферизуется через freeze(); UPDATE/DELETE без RETURNING
+        # строк не возвращают, а их rowcount нужен вызывающему
+        if not orm_execute_state.is_orm_statement and result.returns_rows:
+            result = result.freeze()()
+    finally:
+        state['orm_statements'] = None
+    if statements:
+        _record_time(state, time.perf_counter() - started, statements[0])
+    return result
+
+
+def _before_render(sender, template, context, **extra):
+    state = _state()
+    if state is not None:
+        state['render_started'].append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+    state = _state()
+    if state is not None and state['render_started']:
+        state['render_time'] += time.perf_counter() - state['render_started'].pop()
+
+
+def _start_request():
+    g._metrics = {
+        'started': time.perf_counter(), 'queries': 0, 'sql_time': 0.0,
+        'statements': [], 'orm_statements': None, 'render_time': 0.0, 'render_started': [],
+    }
+
+
+def init_metrics(app):
+    """Подключает сбор метрик к приложению и регистрирует /metrics."""
+    metrics = Metrics()
+    app.extensions['metrics'] = metrics
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(db.session, 'do_orm_execute', _orm_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+    app.before_request(_start_request)
+
+    threshold = app.config.get('SLOW_REQUEST_MS', 500) / 1000
+    budgets = app.config.get('QUERY_BUDGETS', {})
+
+    @app.after_request
+    def _finish_request(response):
+        state = g.pop('_metrics', None)
+        if state is None or request.endpoint == 'metrics':
+            return response
+        duration = time.perf_counter() - state['started']
+        # У потоковых ответов размер заранее неизвестен
+        size = response.content_length or 0
+        endpoint = request.endpoint or 'unknown'
+        metrics.observe(endpoint, request.method, response.status_code, duration,
+                        state['queries'], state['sql_time'], state['render_time'], size)
+        budget = budgets.get(endpoint)
+        if budget is not None and state['queries'] > budget:
+            message = (f"{endpoint}: {state['queries']} SQL-выражений при бюджете {budget} "
+                       f"({request.method} {request.path})")
+            if app.testing or app.config.get('QUERY_BUDGET_ENFORCE'):
+                raise QueryBudgetExceeded(message)
+            app.logger.warning(message)
+        if duration >= threshold:
+            slowest = sorted(state['statements'], key=lambda item: item[0], reverse=True)
+            slow_log.warning(json.dumps({
+                'endpoint': endpoint,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 1),
+                'sql_count': state['queries'],
+                'sql_ms': round(state['sql_time'] * 1000, 1),
+                'render_ms': round(state['render_time'] * 1000, 1),
+                'bytes': size,
+                'slowest': [
+                    {'ms': round(elapsed * 1000, 1), 'sql': statement[:STATEMENT_PREVIEW]}
+                    for elapsed, statement in slowest
+                ],
+            }, ensure_ascii=False))
+        return response
+
+    @app.route('/metrics', endpoint='metrics')
+    def metrics_endpoint():
+        token = app.config.get('METRICS_TOKEN')
+        if token:
+            supplied = request.headers.get('Authorization', '')
+            if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+                abort(401)
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    return metrics
@@ -0,0 +1,159 @@
+"""Миграции схемы для уже существующих баз.
+
+db.create_all() создаёт только отсутствующие таблицы и не трогает существующие,
+поэтому индексы и ограничения, добавленные в модели позже, догоняются здесь.
+Номер применённой миграции хранится в PRAGMA user_version файла SQLite.
+"""
+from sqlalchemy import text
+
+from models import db
+
+
+def _dedupe_journal(conn):
+    # Перед созданием уникальных индексов оставляем только первую запись на ученика,
+    # предмет и дату: прежние формы находили её через first() и правили именно её,
+    # а более поздние дубли так и оставались со старыми значениями
+    for table in ('attendance', 'grade'):
+        conn.execute(text(
+            f"DELETE FROM {table} WHERE id NOT IN ("
+            f"SELECT MIN(id) FROM {table} GROUP BY student_id, subject_id, date)"
+        ))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_attendance_student_subject_date "
+        "ON attendance (student_id, subject_id, date)"
+    ))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_grade_student_subject_date "
+        "ON grade (student_id, subject_id, date)"
+    ))
+
+
+def _journal_indexes(conn):
+    # Составные индексы под фильтры форм и отчётов; уникальные индексы из
+    # предыдущего шага покрывают поиск по (student_id, subject_id, date)
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_attendance_subject_date_student "
+        "ON attendance (subject_id, date, student_id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_grade_subject_date_student "
+        "ON grade (subject_id, date, student_id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_student_class_id ON student (class_id)"
+    ))
+    # Обновляем статистику, чтобы планировщик SQLite начал выбирать новые индексы
+    conn.execute(text('ANALYZE'))
+
+
+def _journal_summaries(conn):
+    # Таблицы сводок уже созданы create_all; заполняем их по накопленному журналу
+    conn.execute(text("DELETE FROM attendance_summary"))
+    conn.execute(text(
+        "INSERT INTO attendance_summary (student_id, subject_id, week_start, present_days, total_days) "
+        "SELECT student_id, subject_id, date(date, 'weekday 0', '-6 days'), "
+        "SUM(CASE WHEN present THEN 1 ELSE 0 END), COUNT(id) "
+        "FROM attendance GROUP BY student_id, subject_id, date(date, 'weekday 0', '-6 days')"
+    ))
+    conn.execute(text("DELETE FROM grade_summary"))
+    conn.execute(text(
+        "INSERT INTO grade_summary (student_id, subject_id, week_start, grade_sum, grade_count) "
+        "SELECT student_id, subject_id, date(date, 'weekday 0', '-6 days'), SUM(value), COUNT(id) "
+        "FROM grade WHERE date IS NOT NULL "
+        "GROUP BY student_id, subject_id, date(date, 'weekday 0', '-6 days')"
+    ))
+
+
+def _journal_versions(conn):
+    # Номер версии записи для форм с оптимистичной блокировкой; в новой базе
+    # колонку уже создал create_all
+    for table in ('attendance', 'grade'):
+        columns = {row[1] for row in conn.execute(text(f'PRAGMA table_info({table})'))}
+        if 'version' not in columns:
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1'))
+
+
+def _attendance_daily(conn):
+    # Дневная сводка посещаемости по классам для общешкольной сводки
+    conn.execute(text("DELETE FROM attendance_daily"))
+    conn.execute(text(
+        "INSERT INTO attendance_daily (day, class_id, subject_id, present_count, total_count) "
+        "SELECT attendance.date, student.class_id, attendance.subject_id, "
+        "SUM(CASE WHEN attendance.present THEN 1 ELSE 0 END), COUNT(attendance.id) "
+        "FROM attendance JOIN student ON student.id = attendance.student_id "
+        "WHERE student.class_id IS NOT NULL "
+        "GROUP BY attendance.date, student.class_id, attendance.subject_id"
+    ))
+
+
+def _search_name(column):
+    # Токенизатор unicode61 складывает регистр кириллицы, но «ё» и «е» для него разные
+    # буквы; search.normalize() делает ту же замену в запросе
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _student_search(conn):
+    # Индекс по ФИО для сортировки и для поиска через LIKE, если FTS5 нет
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_student_full_name ON student (full_name)"))
+    if not conn.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar():
+        return
+    # Полнотекстовый индекс ФИО учеников (см. search.py): rowid совпадает с student.id,
+    # prefix='2 3' заранее индексирует короткие префиксы для подсказок при вводе.
+    # Триггеры держат его в согласии с таблицей student при любом способе записи —
+    # формы, API, импорт, удаление ученика пачкой запросов
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS student_search USING fts5("
+        "full_name, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS student_search_insert AFTER INSERT ON student BEGIN "
+        f"INSERT INTO student_search (rowid, full_name) VALUES (new.id, {_search_name('new.full_name')}); "
+        "END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS student_search_delete AFTER DELETE ON student BEGIN "
+        "DELETE FROM student_search WHERE rowid = old.id; "
+        "END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS student_search_update AFTER UPDATE OF full_name ON student BEGIN "
+        f"UPDATE student_search SET full_name = {_search_name('new.full_name')} WHERE rowid = new.id; "
+        "END"
+    ))
+    conn.execute(text("DELETE FROM student_search"))
+    conn.execute(text(
+        f"INSERT INTO student_search (rowid, full_name) SELECT id, {_search_name('full_name')} FROM student"
+    ))
+
+
+# Порядок важен: индекс в списке + 1 — это версия схемы после шага
+MIGRATIONS = [
+    _dedupe_journal,
+    _journal_indexes,
+    _journal_summaries,
+    _journal_versions,
+    _attendance_daily,
+    _student_search,
+]
+
+
+def schema_version(conn):
+    return conn.execute(text('PRAGMA user_version')).scalar()
+
+
+def upgrade_database():
+    """Применяет недостающие миграции к текущей базе. Возвращает список применённых версий."""
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        # Остальные СУБД разворачиваются с нуля через create_all, миграции не нужны
+        return []
+    applied = []
+    with engine.begin() as conn:
+        current = schema_version(conn)
+        for version, migration in enumerate(MIGRATIONS, start=1):
+            if version <= current:
+                continue
+            migration(conn)
+            conn.execute(text(f'PRAGMA user_version = {version}'))
+            applied.append(version)
+    return applied
@@ -0,0 +1,154 @@
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+
+db = SQLAlchemy()
+
+
+def init_engine(app):
+    """Настраивает каждое новое соединение SQLite: WAL, ожидание блокировок, synchronous.
+
+    В режиме WAL читатели не блокируют писателя и наоборот, а busy_timeout
+    заставляет ждать освобождения записи вместо ошибки «database is locked».
+    """
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    journal_mode = app.config['SQLITE_JOURNAL_MODE']
+    synchronous = app.config['SQLITE_SYNCHRONOUS']
+    busy_timeout = int(app.config['SQLITE_BUSY_TIMEOUT_MS'])
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'PRAGMA busy_timeout = {busy_timeout}')
+        cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+        cursor.execute(f'PRAGMA synchronous = {synchronous}')
+        cursor.close()
+
+
+def dialect_insert(model):
+    """INSERT с поддержкой ON CONFLICT для текущей СУБД (SQLite или PostgreSQL)."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+# Модели
+class Teacher(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(50), nullable=False, unique=True)
+    # Хэш пароля (см. auth.py); в SQLite длина строки не ограничивается, старые базы подходят
+    password = db.Column(db.String(255), nullable=False)
+    full_name = db.Column(db.String(100), nullable=False)
+
+class ServerSession(db.Model):
+    __tablename__ = 'server_session'
+    id = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+    expires = db.Column(db.DateTime, nullable=False, index=True)
+
+class Class(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+    # Отношения-коллекции не подгружаются неявно: обращение без selectinload()/joinedload()
+    # в запросе сразу падает, а не превращается в запрос на каждого ученика (N+1)
+    students = db.relationship('Student', backref='class', lazy='raise_on_sql')
+
+class Student(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    # Полнотекстовый поиск по ФИО — в таблице student_search (см. migrations.py, search.py)
+    full_name = db.Column(db.String(100), nullable=False, index=True)
+    class_id = db.Column(db.Integer, db.ForeignKey('class.id'), index=True)
+    # Ученик удаляется пачкой запросов (см. delete_student), каскад оставлен для ORM-удаления
+    # объектов с заранее загруженными коллекциями
+    attendances = db.relationship('Attendance', backref='student', lazy='raise_on_sql', cascade="all, delete-orphan")
+    grades = db.relationship('Grade', backref='student', lazy='raise_on_sql', cascade="all, delete-orphan")
+
+class Subject(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+
+class Attendance(db.Model):
+    # Одна отметка на ученика, предмет и дату: на этом индексе держится пакетный upsert
+    __table_args__ = (
+        db.Index('uq_attendance_student_subject_date', 'student_id', 'subject_id', 'date', unique=True),
+        # Формы и отчёты по классу фильтруют по предмету и дате, а потом по ученикам
+        db.Index('ix_attendance_subject_date_student', 'subject_id', 'date', 'student_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    present = db.Column(db.Boolean, default=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'))
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'))
+    # Номер версии записи: растёт при каждом изменении, по нему формы ловят чужие правки
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+class Grade(db.Model):
+    __table_args__ = (
+        db.Index('uq_grade_student_subject_date', 'student_id', 'subject_id', 'date', unique=True),
+        db.Index('ix_grade_subject_date_student', 'subject_id', 'date', 'student_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.Integer, nullable=False)
+    date = db.Column(db.Date)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'))
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'))
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+# Ревизия данных журнала: растёт при каждом изменении оценок, посещаемости и списков.
+# По ней API отдаёт ETag/Last-Modified, не выполняя основных запросов.
+class JournalRevision(db.Model):
+    __tablename__ = 'journal_revision'
+    id = db.Column(db.Integer, primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+# Последняя ревизия журнала, в которой менялись записи ученика: по ней прогноз
+# (forecast.py) пересчитывает только учеников, изменившихся с прошлого раза.
+# Внешнего ключа нет — строка удалённого ученика тоже сообщает об изменении.
+class JournalChange(db.Model):
+    __tablename__ = 'journal_change'
+    student_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    revision = db.Column(db.Integer, nullable=False, index=True)
+
+# Недельные сводки журнала: отчёты за период читают их вместо сырых записей.
+# week_start — понедельник недели. Поддерживаются модулем summary.py.
+class AttendanceSummary(db.Model):
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), primary_key=True)
+    week_start = db.Column(db.Date, primary_key=True)
+    present_days = db.Column(db.Integer, nullable=False, default=0)
+    total_days = db.Column(db.Integer, nullable=False, default=0)
+
+class GradeSummary(db.Model):
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), primary_key=True)
+    week_start = db.Column(db.Date, primary_key=True)
+    grade_sum = db.Column(db.Integer, nullable=False, default=0)
+    grade_count = db.Column(db.Integer, nullable=False, default=0)
+
+# Дневная сводка посещаемости по классу и предмету для общешкольной сводки (dashboard.py).
+# Одна строка на (день, класс, предмет) вместо строки на каждого ученика.
+class AttendanceDaily(db.Model):
+    __tablename__ = 'attendance_daily'
+    day = db.Column(db.Date, primary_key=True)
+    class_id = db.Column(db.Integer, db.ForeignKey('class.id'), primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), primary_key=True)
+    present_count = db.Column(db.Integer, nullable=False, default=0)
+    total_count = db.Column(db.Integer, nullable=False, default=0)
+
+# Закрытые учебные годы, перенесённые в отдельные файлы SQLite (см. archive.py).
+# year — год начала: 2023 означает 2023/24 учебный год (1 сентября — 31 августа).
+class ArchivedYear(db.Model):
+    __tablename__ = 'archived_year'
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    path = db.Column(db.String(255), nullable=False)  # имя файла в instance/archive
+    attendance_rows = db.Column(db.Integer, nullable=False, default=0)
+    grade_rows = db.Column(db.Integer, nullable=False, default=0)
+    archived_at = db.Column(db.DateTime, nullable=False)
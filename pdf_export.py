@@ -0,0 +1,188 @@
+"""Экспорт отчётов в PDF.
+
+Шрифт с кириллицей и стили регистрируются один раз (init_pdf), а сами документы
+собираются в фоновом пуле потоков. ReportLab загружается только при первой сборке
+PDF: модуль импортируется при старте приложения, но не тянет библиотеку в каждый
+воркер. Готовые PDF кэшируются на диске по ключу (класс, предмет, период, версия
+данных), поэтому повторный экспорт тех же данных отдаётся сразу и доступен всем
+воркерам сервера.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+FONT_NAME = 'DejaVuSans'
+FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'DejaVuSans.ttf')
+PENDING_TIMEOUT = 300  # секунд
+
+_styles = None
+_table_style = None
+_init_lock = threading.Lock()
+
+
+def init_pdf(font_path=FONT_PATH):
+    """Загружает ReportLab, регистрирует шрифт и готовит стили. Повторные вызовы ничего не делают."""
+    global _styles, _table_style
+    if _styles is not None:
+        return
+    with _init_lock:
+        if _styles is not None:
+            return
+        from reportlab.lib import colors
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        from reportlab.platypus import TableStyle
+
+        if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(FONT_NAME, font_path))
+        _table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, -1), FONT_NAME),  # Используем шрифт с кириллицей
+            ('FONTSIZE', (0, 0), (-1, 0), 14),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ])
+        styles = getSampleStyleSheet()
+        # Изменяем стиль для поддержки кириллицы
+        styles['Title'].fontName = FONT_NAME
+        styles['Normal'].fontName = FONT_NAME
+        _styles = styles
+
+
+def render_report_pdf(title, student_data):
+    """Собирает PDF отчёта и возвращает его содержимое в байтах."""
+    init_pdf()
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, Paragraph
+
+    output = io.BytesIO()
+    doc = SimpleDocTemplate(output, pagesize=letter)
+    elements = [Paragraph(title, _styles['Title'])]
+
+    table_data = [['ФИО', 'Посещаемость (%)', 'Оценки', 'Средняя оценка']]
+    for student in student_data:
+        table_data.append([
+            student['full_name'],
+            f"{student['attendance_percentage']}%",
+            ', '.join(map(str, student['grades'])) if student['grades'] else 'Нет оценок',
+            str(student['average_grade']) if student['average_grade'] else 'Нет оценок'
+        ])
+
+    table = Table(table_data)
+    table.setStyle(_table_style)
+    elements.append(table)
+
+    doc.build(elements)
+    return output.getvalue()
+
+
+def report_key(class_id, subject_id, start_date, end_date, student_data):
+    """Ключ кэша: параметры отчёта плюс хэш самих данных как их версия."""
+    data_version = hashlib.sha256(
+        json.dumps(student_data, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+    raw = f'{class_id}:{subject_id}:{start_date}:{end_date}:{data_version}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+class PdfJobs:
+    """Очередь фоновой генерации PDF с дисковым кэшем готовых файлов."""
+
+    def __init__(self, cache_dir, max_workers=2, cache_size=200):
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pdf')
+        self._pending = {}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, job_id, suffix='.pdf'):
+        return os.path.join(self.cache_dir, job_id + suffix)
+
+    def submit(self, job_id, title, student_data):
+        """Ставит отчёт в очередь, если его ещё нет в кэше. Возвращает job_id."""
+        with self._lock:
+            if os.path.exists(self._path(job_id)) or job_id in self._pending:
+                return job_id
+            # Метка видна всем воркерам, пока отчёт собирается
+            open(self._path(job_id, '.pending'), 'w').close()
+            self._pending[job_id] = self._executor.submit(self._render, job_id, title, student_data)
+        return job_id
+
+    def _render(self, job_id, title, student_data):
+        try:
+            pdf = render_report_pdf(title, student_data)
+            tmp_path = self._path(job_id, '.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(pdf)
+            # Атомарная замена: другие воркеры не увидят недописанный файл
+            os.replace(tmp_path, self._path(job_id))
+            self._prune()
+        except Exception as e:
+            with open(self._path(job_id, '.err'), 'w', encoding='utf-8') as f:
+                f.write(str(e))
+        finally:
+            with self._lock:
+                self._pending.pop(job_id, None)
+            try:
+                os.remove(self._path(job_id, '.pending'))
+            except OSError:
+                pass
+
+    def _prune(self):
+        files = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir) if name.endswith('.pdf')
+        ]
+        if len(files) <= self.cache_size:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.cache_size]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def status(self, job_id):
+        """Возвращает 'done', 'pending', 'error' или 'missing'."""
+        if os.path.exists(self._path(job_id)):
+            return 'done'
+        if os.path.exists(self._path(job_id, '.err')):
+            return 'error'
+        with self._lock:
+            if job_id in self._pending:
+                return 'pending'
+        # Задачу мог взять другой воркер; метку упавшего воркера считаем устаревшей
+        try:
+            if time.time() - os.path.getmtime(self._path(job_id, '.pending')) < PENDING_TIMEOUT:
+                return 'pending'
+        except OSError:
+            pass
+        return 'missing'
+
+    def pop_error(self, job_id):
+        path = self._path(job_id, '.err')
+        try:
+            with open(path, encoding='utf-8') as f:
+                message = f.read()
+            os.remove(path)
+        except OSError:
+            message = ''
+        return message
+
+    def path(self, job_id):
+        return self._path(job_id)
+
+    @staticmethod
+    def valid_id(job_id):
+        return len(job_id) == 32 and all(c in '0123456789abcdef' for c in job_id)
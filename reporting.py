@@ -0,0 +1,158 @@
+from collections import Counter
+
+from models import db, Class, Student, Subject, Grade, AttendanceDaily
+from summary import attendance_totals
+import archive
+
+GRADE_VALUES = (2, 3, 4, 5)
+
+
+def _attendance_totals(years, start_date, end_date, student_ids=None, subject_id=None):
+    """Посещаемость за период по рабочей базе и задетым периодом архивным годам."""
+    totals = attendance_totals(start_date, end_date, student_ids, subject_id)
+    for key, (total, present) in archive.attendance_totals(
+        years, start_date, end_date, student_ids, subject_id
+    ).items():
+        old_total, old_present = totals.get(key, (0, 0))
+        totals[key] = (old_total + total, old_present + present)
+    return totals
+
+
+def _grade_lists(student_ids, subject_id, start_date, end_date, years=()):
+    """Возвращает {student_id: [оценки]} одним запросом, в порядке добавления оценок.
+
+    Оценки из архивных лет идут раньше оценок рабочей базы.
+    """
+    if not student_ids:
+        return {}
+    rows = db.session.query(Grade.student_id, Grade.value).filter(
+        Grade.student_id.in_(student_ids),
+        Grade.subject_id == subject_id,
+        Grade.date >= start_date,
+        Grade.date <= end_date
+    ).order_by(Grade.student_id, Grade.id).all()
+    grades = {}
+    for student_id, _, value in archive.grade_rows(years, start_date, end_date, student_ids, subject_id):
+        grades.setdefault(student_id, []).append(value)
+    for student_id, value in rows:
+        grades.setdefault(student_id, []).append(value)
+    return grades
+
+
+def make_student_row(full_name, total_days, present_days, grade_values):
+    """Формирует строку отчёта в том же виде, в каком её ждут шаблон и экспорт в PDF."""
+    attendance_percentage = (present_days / total_days * 100) if total_days > 0 else 0
+    average_grade = sum(grade_values) / len(grade_values) if grade_values else None
+    return {
+        'full_name': full_name,
+        'attendance_percentage': round(attendance_percentage, 2),
+        'grades': grade_values,
+        'average_grade': round(average_grade, 2) if average_grade else None,
+        'total_days': total_days,  # Для отладки
+        'present_days': present_days  # Для отладки
+    }
+
+
+def build_student_report(class_id, subject_id, start_date, end_date, years=None):
+    """Собирает данные отчёта по классу и предмету за период.
+
+    Вместо двух запросов на каждого ученика выполняется постоянное число запросов:
+    список учеников, агрегаты посещаемости (сводка и края периода) и список оценок.
+    Если период задевает архивные годы (years, по умолчанию ищутся по периоду),
+    те же агрегаты досчитываются по их файлам.
+    """
+    students = db.session.query(Student.id, Student.full_name).filter(
+        Student.class_id == class_id
+    ).order_by(Student.full_name, Student.id).all()
+    student_ids = [student.id for student in students]
+    if years is None:
+        years = archive.years_between(start_date, end_date) if student_ids else []
+
+    # Посещаемость за полные недели читается из недельной сводки
+    attendance = _attendance_totals(years, start_date, end_date, student_ids, subject_id) if student_ids else {}
+    grades = _grade_lists(student_ids, subject_id, start_date, end_date, years)
+
+    student_data = []
+    for student in students:
+        total_days, present_days = attendance.get((student.id, int(subject_id)), (0, 0))
+        student_data.append(make_student_row(
+            student.full_name, total_days, present_days, grades.get(student.id, [])
+        ))
+    return student_data
+
+
+def build_school_report(start_date, end_date):
+    """Собирает отчёты по всем классам и предметам за период несколькими общими запросами.
+
+    Возвращает список (класс, предмет, student_data) для каждого класса с учениками.
+    """
+    classes = Class.query.order_by(Class.name).all()
+    subjects = Subject.query.order_by(Subject.id).all()
+    students = db.session.query(Student.id, Student.full_name, Student.class_id).order_by(
+        Student.full_name, Student.id
+    ).all()
+
+    years = archive.years_between(start_date, end_date)
+    attendance = _attendance_totals(years, start_date, end_date)
+
+    grades = {}
+    for student_id, subject_id, value in archive.grade_rows(years, start_date, end_date):
+        grades.setdefault((student_id, subject_id), []).append(value)
+    rows = db.session.query(Grade.student_id, Grade.subject_id, Grade.value).filter(
+        Grade.date >= start_date,
+        Grade.date <= end_date
+    ).order_by(Grade.student_id, Grade.subject_id, Grade.id)
+    for student_id, subject_id, value in rows:
+        grades.setdefault((student_id, subject_id), []).append(value)
+
+    roster = {}
+    for student in students:
+        roster.setdefault(student.class_id, []).append(student)
+
+    reports = []
+    for class_ in classes:
+        class_students = roster.get(class_.id)
+        if not class_students:
+            continue
+        for subject in subjects:
+            student_data = []
+            for student in class_students:
+                total_days, present_days = attendance.get((student.id, subject.id), (0, 0))
+                student_data.append(make_student_row(
+                    student.full_name, total_days, present_days, grades.get((student.id, subject.id), [])
+                ))
+            reports.append((class_, subject, student_data))
+    return reports
+
+
+def build_chart_data(class_id, subject_id, start_date, end_date, student_data, years):
+    """Компактные ряды для графиков по уже собранному отчёту (build_student_report).
+
+    Оценки и посещаемость учеников берутся из отчёта, распределение оценок
+    считается по нему же, а посещаемость по дням — из дневной сводки класса
+    и архивных лет периода (years).
+    """
+    distribution = Counter(value for row in student_data for value in row['grades'])
+    days = db.session.query(
+        AttendanceDaily.day, AttendanceDaily.present_count, AttendanceDaily.total_count
+    ).filter(
+        AttendanceDaily.class_id == class_id,
+        AttendanceDaily.subject_id == subject_id,
+        AttendanceDaily.day >= start_date,
+        AttendanceDaily.day <= end_date
+    ).order_by(AttendanceDaily.day).all()
+    if years:
+        days = archive.daily_attendance(years, class_id, subject_id, start_date, end_date) + days
+    return {
+        'students': [row['full_name'] for row in student_data],
+        'average_grade': [row['average_grade'] for row in student_data],
+        'attendance_percentage': [row['attendance_percentage'] for row in student_data],
+        'grade_distribution': {
+            'labels': list(GRADE_VALUES),
+            'counts': [distribution.get(value, 0) for value in GRADE_VALUES],
+        },
+        'attendance_by_day': {
+            'labels': [day.isoformat() for day, _, _ in days],
+            'percentage': [round(present / total * 100, 1) if total else None for _, present, total in days],
+        },
+    }
@@ -0,0 +1,80 @@
+"""Поиск учеников по ФИО во всех классах — для подсказок при вводе.
+
+Каждое слово запроса ищется как начало одного из слов ФИО, регистр не важен,
+«ё» и «е» не различаются: «фед ан» найдёт «Фёдоров Андрей». В SQLite поиск идёт
+по полнотекстовому индексу FTS5 student_search, который создаёт миграция и
+обновляют триггеры на таблице student (см. migrations.py), поэтому добавление,
+удаление и импорт учеников ничего дополнительно делать не должны. В других СУБД
+и в сборках SQLite без FTS5 — запасной вариант через ILIKE по индексу full_name.
+"""
+import re
+
+from flask import current_app
+from sqlalchemy import text, func, and_, or_
+
+from models import db, Student
+
+MAX_RESULTS = 20
+# Больше слов в ФИО не бывает, лишние только замедлили бы запрос
+MAX_WORDS = 4
+
+_WORD = re.compile(r'\w+')
+
+
+def normalize(value):
+    """Заменяет «ё» на «е» — так же, как это делают триггеры индекса."""
+    return value.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def _has_fts():
+    # Наличие таблицы проверяется один раз на приложение
+    available = current_app.extensions.get('student_search')
+    if available is None:
+        available = db.session.get_bind().dialect.name == 'sqlite' and db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'student_search'"
+        )).first() is not None
+        current_app.extensions['student_search'] = available
+    return available
+
+
+def _fts_search(words, limit):
+    # Слова в кавычках: символы запроса не разбираются как синтаксис FTS5
+    match = ' '.join(f'"{word}"*' for word in words)
+    return db.session.execute(text(
+        "SELECT student.id, student.full_name, student.class_id "
+        "FROM student_search JOIN student ON student.id = student_search.rowid "
+        "WHERE student_search MATCH :match "
+        "ORDER BY student_search.rank, student.full_name LIMIT :limit"
+    ), {'match': match, 'limit': limit}).all()
+
+
+def _like_search(words, limit):
+    name = func.replace(func.replace(Student.full_name, 'ё', 'е'), 'Ё', 'Е')
+    conditions = []
+    for word in words:
+        pattern = word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        # lower() и LIKE в SQLite складывают регистр только латиницы, поэтому кириллица
+        # ищется в тех написаниях, в которых ФИО хранятся: «иванов», «Иванов», «ИВАНОВ»
+        variants = {pattern.lower(), pattern.capitalize(), pattern.upper()}
+        conditions.append(or_(*(
+            condition
+            for variant in sorted(variants)
+            for condition in (
+                name.ilike(f'{variant}%', escape='\\'),
+                name.ilike(f'% {variant}%', escape='\\')
+            )
+        )))
+    return db.session.query(Student.id, Student.full_name, Student.class_id).filter(
+        and_(*conditions)
+    ).order_by(Student.full_name, Student.id).limit(limit).all()
+
+
+def search_students(query, limit=10):
+    """Возвращает строки (id, full_name, class_id) учеников, подходящих под запрос."""
+    words = _WORD.findall(normalize(query))[:MAX_WORDS]
+    if not words:
+        return []
+    limit = max(1, min(limit, MAX_RESULTS))
+    if _has_fts():
+        return _fts_search(words, limit)
+    return _like_search(words, limit)
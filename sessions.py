@@ -0,0 +1,94 @@
+"""Хранение сессий на стороне сервера.
+
+В cookie лежит только случайный идентификатор сессии, а данные (teacher_id,
+flash-сообщения) — в таблице server_session. Так сессию можно отозвать на
+сервере, а подделать её, зная SECRET_KEY, нельзя. Строка сессии читается
+одним запросом по первичному ключу и пишется только если сессия изменилась.
+"""
+import secrets
+from datetime import datetime
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from models import db, ServerSession
+
+SESSION_ID_BYTES = 32
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class DatabaseSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def _lifetime(self, app):
+        return app.config['SERVER_SESSION_LIFETIME']
+
+    def open_session(self, app, request):
+        if app.static_url_path and request.path.startswith(app.static_url_path + '/'):
+            # Статике сессия не нужна: не ходим за ней в базу
+            return ServerSideSession(new=True)
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            table = ServerSession.__table__
+            with db.engine.connect() as conn:
+                row = conn.execute(
+                    table.select().where(table.c.id == sid, table.c.expires > datetime.utcnow())
+                ).first()
+            if row is not None:
+                return ServerSideSession(self.serializer.loads(row.data), sid=sid)
+        return ServerSideSession(sid=secrets.token_urlsafe(SESSION_ID_BYTES), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        table = ServerSession.__table__
+
+        if not session:
+            if session.modified and not session.new:
+                with db.engine.begin() as conn:
+                    conn.execute(table.delete().where(table.c.id == session.sid))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not session.modified:
+            return
+
+        expires = datetime.utcnow() + self._lifetime(app)
+        data = self.serializer.dumps(dict(session))
+        with db.engine.begin() as conn:
+            updated = conn.execute(
+                table.update().where(table.c.id == session.sid).values(data=data, expires=expires)
+            ).rowcount
+            if not updated:
+                conn.execute(table.insert().values(id=session.sid, data=data, expires=expires))
+                # Заодно чистим просроченные сессии, это дёшево благодаря индексу
+                conn.execute(table.delete().where(table.c.expires <= datetime.utcnow()))
+        response.set_cookie(
+            name, session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+
+def rotate_session(session):
+    """Выдаёт сессии новый идентификатор при входе, чтобы старый нельзя было навязать."""
+    if not session.new:
+        table = ServerSession.__table__
+        with db.engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.id == session.sid))
+    session.sid = secrets.token_urlsafe(SESSION_ID_BYTES)
+    session.new = True
+    session.modified = True
@@ -0,0 +1,65 @@
+// Графики отчёта: данные загружаются отдельным запросом после того, как таблица уже показана
+document.addEventListener('DOMContentLoaded', function () {
+    const container = document.getElementById('reportCharts');
+    if (!container) {
+        return;
+    }
+    const status = document.getElementById('reportChartsStatus');
+
+    function barChart(canvasId, labels, label, data, color, max) {
+        new Chart(document.getElementById(canvasId), {
+            type: 'bar',
+            data: {
+                labels: labels,
+                datasets: [{
+                    label: label,
+                    data: data,
+                    backgroundColor: color.replace('1)', '0.5)'),
+                    borderColor: color,
+                    borderWidth: 1
+                }]
+            },
+            options: {
+                scales: { y: { beginAtZero: true, max: max } },
+                plugins: { legend: { display: true } }
+            }
+        });
+    }
+
+    fetch(container.dataset.url, { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+        .then(function (response) {
+            if (!response.ok) {
+                throw new Error(response.status);
+            }
+            return response.json();
+        })
+        .then(function (data) {
+            status.remove();
+            barChart('gradesChart', data.students, 'Средняя оценка',
+                     data.average_grade, 'rgba(54, 162, 235, 1)');
+            barChart('attendanceChart', data.students, 'Посещаемость (%)',
+                     data.attendance_percentage, 'rgba(75, 192, 192, 1)', 100);
+            barChart('distributionChart', data.grade_distribution.labels, 'Количество оценок',
+                     data.grade_distribution.counts, 'rgba(255, 159, 64, 1)');
+            new Chart(document.getElementById('attendanceByDayChart'), {
+                type: 'line',
+                data: {
+                    labels: data.attendance_by_day.labels,
+                    datasets: [{
+                        label: 'Посещаемость класса по дням (%)',
+                        data: data.attendance_by_day.percentage,
+                        borderColor: 'rgba(153, 102, 255, 1)',
+                        backgroundColor: 'rgba(153, 102, 255, 0.2)',
+                        spanGaps: true
+                    }]
+                },
+                options: {
+                    scales: { y: { beginAtZero: true, max: 100 } },
+                    plugins: { legend: { display: true } }
+                }
+            });
+        })
+        .catch(function () {
+            status.textContent = 'Не удалось загрузить графики.';
+        });
+});
@@ -0,0 +1,63 @@
+// Поиск ученика по ФИО: подсказки приходят из /api/v1/students/search по мере ввода
+document.addEventListener('DOMContentLoaded', function () {
+    const input = document.getElementById('studentSearch');
+    if (!input) {
+        return;
+    }
+    const results = document.getElementById('studentSearchResults');
+    // Ссылка на класс собирается из шаблона с class_id=0 в конце адреса
+    const classUrl = input.dataset.classUrl.replace(/0$/, '');
+    let timer = null;
+    let controller = null;
+
+    function show(items) {
+        results.replaceChildren();
+        items.forEach(function (item) {
+            const link = document.createElement('a');
+            link.className = 'list-group-item list-group-item-action';
+            link.href = classUrl + item.class_id;
+            link.textContent = item.full_name + (item.class_name ? ' — ' + item.class_name : '');
+            results.appendChild(link);
+        });
+        if (!items.length) {
+            const empty = document.createElement('div');
+            empty.className = 'list-group-item text-muted';
+            empty.textContent = 'Никого не нашлось';
+            results.appendChild(empty);
+        }
+    }
+
+    function search() {
+        const query = input.value.trim();
+        if (controller) {
+            controller.abort();
+        }
+        if (!query) {
+            results.replaceChildren();
+            return;
+        }
+        controller = new AbortController();
+        const url = input.dataset.url + '?' + new URLSearchParams({ q: query, limit: 10 });
+        fetch(url, { credentials: 'same-origin', headers: { 'Accept': 'application/json' }, signal: controller.signal })
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.json();
+            })
+            .then(function (data) {
+                show(data.items);
+            })
+            .catch(function (error) {
+                if (error.name !== 'AbortError') {
+                    results.replaceChildren();
+                }
+            });
+    }
+
+    // Запрос уходит после короткой паузы в наборе, а не на каждую букву
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(search, 150);
+    });
+});
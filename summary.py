@@ -0,0 +1,304 @@
+"""Недельные сводки посещаемости и оценок.
+
+AttendanceSummary и GradeSummary хранят по (ученик, предмет, неделя) число
+отметок и присутствий, сумму и количество оценок. Сводки пересчитываются из
+сырых записей для затронутых недель при каждом сохранении журнала и удалении
+ученика; rebuild() пересобирает их целиком, rebuild_period() — за период,
+check() сверяет с сырыми таблицами.
+
+AttendanceDaily хранит отметки по (день, класс, предмет) для общешкольной
+сводки; она обновляется теми же путями записи, что и недельные сводки.
+"""
+import datetime
+
+from sqlalchemy import func, case, or_, and_, cast, Date, update, bindparam
+
+from models import (
+    db, dialect_insert, Student, Attendance, Grade, AttendanceSummary, GradeSummary, AttendanceDaily
+)
+
+SUMMARY_KEY = ['student_id', 'subject_id', 'week_start']
+DAILY_KEY = ['day', 'class_id', 'subject_id']
+
+
+def week_start(date):
+    """Понедельник недели, в которую попадает дата."""
+    return date - datetime.timedelta(days=date.weekday())
+
+
+def _week_expr(column):
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return cast(func.date_trunc('week', column), Date)
+    # В SQLite: ближайшее воскресенье не раньше даты минус шесть дней — понедельник
+    return func.date(column, 'weekday 0', '-6 days')
+
+
+def _present_sum():
+    return func.sum(case((Attendance.present == True, 1), else_=0))  # noqa: E712
+
+
+# Описание каждой сводки: сырая модель и агрегаты, из которых собираются колонки
+def _attendance_columns():
+    return {'present_days': _present_sum(), 'total_days': func.count(Attendance.id)}
+
+
+def _grade_columns():
+    return {'grade_sum': func.sum(Grade.value), 'grade_count': func.count(Grade.id)}
+
+
+def _refresh(model, summary_model, columns, student_ids, subject_id, dates):
+    student_ids = list(student_ids)
+    if not student_ids:
+        return
+    for week in sorted({week_start(date) for date in dates}):
+        week_end = week + datetime.timedelta(days=6)
+        rows = db.session.query(model.student_id, *columns.values()).filter(
+            model.student_id.in_(student_ids),
+            model.subject_id == subject_id,
+            model.date >= week,
+            model.date <= week_end
+        ).group_by(model.student_id).all()
+
+        values = [
+            dict(zip(['student_id', *columns], row), subject_id=subject_id, week_start=week)
+            for row in rows
+        ]
+        if values:
+            stmt = dialect_insert(summary_model)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=SUMMARY_KEY,
+                set_={column: stmt.excluded[column] for column in columns}
+            )
+            db.session.execute(stmt, values)
+
+        # Недели, где у ученика не осталось записей, из сводки убираем
+        empty = set(student_ids) - {row[0] for row in rows}
+        if empty:
+            summary_model.query.filter(
+                summary_model.student_id.in_(empty),
+                summary_model.subject_id == subject_id,
+                summary_model.week_start == week
+            ).delete(synchronize_session=False)
+
+
+def refresh_attendance(student_ids, subject_id, dates):
+    """Пересчитывает сводки посещаемости за недели, в которые попадают dates, и дневные сводки классов."""
+    _refresh(Attendance, AttendanceSummary, _attendance_columns(), student_ids, subject_id, dates)
+    refresh_daily(student_ids, subject_id, dates)
+
+
+def _daily_columns():
+    return {'present_count': _present_sum(), 'total_count': func.count(Attendance.id)}
+
+
+def refresh_daily(student_ids, subject_id, dates):
+    """Пересчитывает дневные сводки классов этих учеников по предмету за даты."""
+    student_ids = list(student_ids)
+    dates = sorted(set(dates))
+    if not student_ids or not dates:
+        return
+    class_ids = [class_id for (class_id,) in db.session.query(Student.class_id).filter(
+        Student.id.in_(student_ids), Student.class_id.isnot(None)
+    ).distinct()]
+    if not class_ids:
+        return
+    columns = _daily_columns()
+    rows = db.session.query(Attendance.date, Student.class_id, *columns.values()).join(
+        Student, Student.id == Attendance.student_id
+    ).filter(
+        Student.class_id.in_(class_ids),
+        Attendance.subject_id == subject_id,
+        Attendance.date.in_(dates)
+    ).group_by(Attendance.date, Student.class_id).all()
+
+    if rows:
+        stmt = dialect_insert(AttendanceDaily)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=DAILY_KEY,
+            set_={column: stmt.excluded[column] for column in columns}
+        )
+        db.session.execute(stmt, [
+            dict(zip(['day', 'class_id', *columns], row), subject_id=subject_id) for row in rows
+        ])
+
+    # Дни, где у класса не осталось отметок, из сводки убираем
+    found = {(row[0], row[1]) for row in rows}
+    for class_id in class_ids:
+        empty = [day for day in dates if (day, class_id) not in found]
+        if empty:
+            AttendanceDaily.query.filter(
+                AttendanceDaily.class_id == class_id,
+                AttendanceDaily.subject_id == subject_id,
+                AttendanceDaily.day.in_(empty)
+            ).delete(synchronize_session=False)
+
+
+def refresh_grades(student_ids, subject_id, dates):
+    """Пересчитывает сводки оценок за недели, в которые попадают dates."""
+    _refresh(Grade, GradeSummary, _grade_columns(), student_ids, subject_id, dates)
+
+
+def forget_student(student_id):
+    """Удаляет сводки ученика и вычитает его отметки из дневных сводок класса.
+
+    Вызывается до удаления его записей.
+    """
+    for summary_model in (AttendanceSummary, GradeSummary):
+        summary_model.query.filter_by(student_id=student_id).delete(synchronize_session=False)
+
+    class_id = db.session.query(Student.class_id).filter(Student.id == student_id).scalar()
+    rows = db.session.query(Attendance.date, Attendance.subject_id, *_daily_columns().values()).filter(
+        Attendance.student_id == student_id
+    ).group_by(Attendance.date, Attendance.subject_id).all()
+    if class_id is None or not rows:
+        return
+    table = AttendanceDaily.__table__
+    db.session.execute(
+        update(table).where(
+            table.c.day == bindparam('b_day'),
+            table.c.class_id == class_id,
+            table.c.subject_id == bindparam('b_subject')
+        ).values(
+            present_count=table.c.present_count - bindparam('b_present'),
+            total_count=table.c.total_count - bindparam('b_total')
+        ),
+        [{'b_day': day, 'b_subject': subject, 'b_present': present or 0, 'b_total': total}
+         for day, subject, present, total in rows]
+    )
+    AttendanceDaily.query.filter(
+        AttendanceDaily.class_id == class_id, AttendanceDaily.total_count <= 0
+    ).delete(synchronize_session=False)
+
+
+def _in_period(column, start_date, end_date):
+    if start_date is None:
+        return column.isnot(None)
+    return and_(column >= start_date, column <= end_date)
+
+
+def _aggregate(model, columns, start_date=None, end_date=None):
+    week = _week_expr(model.date)
+    return db.session.query(
+        model.student_id, model.subject_id, week.label('week_start'), *columns.values()
+    ).filter(_in_period(model.date, start_date, end_date)).group_by(model.student_id, model.subject_id, week)
+
+
+def _daily_aggregate(columns, start_date=None, end_date=None):
+    return db.session.query(
+        Attendance.date.label('day'), Student.class_id, Attendance.subject_id, *columns.values()
+    ).join(Student, Student.id == Attendance.student_id).filter(
+        Student.class_id.isnot(None),
+        _in_period(Attendance.date, start_date, end_date)
+    ).group_by(Attendance.date, Student.class_id, Attendance.subject_id)
+
+
+def _summaries(start_date=None, end_date=None):
+    """Все сводки: (модель, ключевые колонки, колонки значений, агрегат по сырым таблицам).
+
+    С периодом агрегаты считаются только по записям с датами внутри него.
+    """
+    attendance, grades, daily = _attendance_columns(), _grade_columns(), _daily_columns()
+    return [
+        (AttendanceSummary, SUMMARY_KEY, list(attendance), _aggregate(Attendance, attendance, start_date, end_date)),
+        (GradeSummary, SUMMARY_KEY, list(grades), _aggregate(Grade, grades, start_date, end_date)),
+        (AttendanceDaily, DAILY_KEY, list(daily), _daily_aggregate(daily, start_date, end_date)),
+    ]
+
+
+def rebuild():
+    """Пересобирает все сводки из сырых таблиц. Коммит остаётся за вызывающим."""
+    counts = {}
+    for summary_model, key, columns, aggregate in _summaries():
+        summary_model.query.delete(synchronize_session=False)
+        db.session.execute(summary_model.__table__.insert().from_select(
+            [*key, *columns], aggregate.statement
+        ))
+        counts[summary_model.__tablename__] = summary_model.query.count()
+    return counts
+
+
+def rebuild_period(start_date, end_date):
+    """Пересобирает сводки за недели, которые задевает период, по оставшимся записям.
+
+    Нужна после удаления журнала за период целиком (перенос года в архив): недели
+    на границах периода остаются в сводке только с записями вне его.
+    """
+    first = week_start(start_date)
+    last = week_start(end_date) + datetime.timedelta(days=6)
+    for summary_model, key, columns, aggregate in _summaries(first, last):
+        period = summary_model.week_start if key is SUMMARY_KEY else summary_model.day
+        summary_model.query.filter(period >= first, period <= last).delete(synchronize_session=False)
+        db.session.execute(summary_model.__table__.insert().from_select(
+            [*key, *columns], aggregate.statement
+        ))
+
+
+def check():
+    """Сверяет сводки с сырыми таблицами. Возвращает список расхождений."""
+    mismatches = []
+    for summary_model, key, columns, aggregate in _summaries():
+        size = len(key)
+        expected = {
+            tuple(str(value) for value in row[:size]): tuple(row[size:]) for row in aggregate
+        }
+        stored = {
+            tuple(str(value) for value in row[:size]): tuple(row[size:])
+            for row in db.session.query(*(getattr(summary_model, column) for column in [*key, *columns]))
+        }
+        for item in expected.keys() | stored.keys():
+            if expected.get(item) != stored.get(item):
+                mismatches.append((summary_model.__tablename__, item, expected.get(item), stored.get(item)))
+    return mismatches
+
+
+def _full_weeks(start_date, end_date):
+    """Первый понедельник и последний понедельник полных недель внутри периода."""
+    first = week_start(start_date)
+    if first < start_date:
+        first += datetime.timedelta(days=7)
+    last = week_start(end_date)
+    if last + datetime.timedelta(days=6) > end_date:
+        last -= datetime.timedelta(days=7)
+    return (first, last) if first <= last else (None, None)
+
+
+def attendance_totals(start_date, end_date, student_ids=None, subject_id=None):
+    """Возвращает {(student_id, subject_id): (total_days, present_days)} за период.
+
+    Полные недели берутся из сводки, а неполные недели по краям периода —
+    из сырых записей, так что результат совпадает с подсчётом по Attendance.
+    """
+    totals = {}
+
+    def add(rows):
+        for student_id, subject, total, present in rows:
+            old_total, old_present = totals.get((student_id, subject), (0, 0))
+            totals[student_id, subject] = (old_total + (total or 0), old_present + (present or 0))
+
+    def scoped(query, model):
+        if student_ids is not None:
+            query = query.filter(model.student_id.in_(student_ids))
+        if subject_id is not None:
+            query = query.filter(model.subject_id == subject_id)
+        return query
+
+    first_week, last_week = _full_weeks(start_date, end_date)
+    raw = db.session.query(
+        Attendance.student_id, Attendance.subject_id, func.count(Attendance.id), _present_sum()
+    )
+    if first_week is None:
+        raw = raw.filter(Attendance.date >= start_date, Attendance.date <= end_date)
+    else:
+        add(scoped(db.session.query(
+            AttendanceSummary.student_id, AttendanceSummary.subject_id,
+            func.sum(AttendanceSummary.total_days), func.sum(AttendanceSummary.present_days)
+        ).filter(
+            AttendanceSummary.week_start >= first_week,
+            AttendanceSummary.week_start <= last_week
+        ), AttendanceSummary).group_by(AttendanceSummary.student_id, AttendanceSummary.subject_id))
+        raw = raw.filter(or_(
+            and_(Attendance.date >= start_date, Attendance.date < first_week),
+            and_(Attendance.date > last_week + datetime.timedelta(days=6), Attendance.date <= end_date)
+        ))
+    add(scoped(raw, Attendance).group_by(Attendance.student_id, Attendance.subject_id))
+    return totals
@@ -0,0 +1,10 @@
+"""Блюпринты страниц журнала, подключаемые в create_app() (app.py).
+
+    auth      главная страница, вход, регистрация и выход
+    journal   классы, ученики, посещаемость и оценки
+    reports   отчёты, графики и выгрузка в PDF
+    forecast  прогноз на конец четверти
+    imports   импорт из CSV и XLSX
+
+API (api.py) и общешкольная сводка (dashboard.py) — отдельные блюпринты в корне проекта.
+"""
@@ -0,0 +1,59 @@
+"""Главная страница, вход, регистрация и выход учителя."""
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+
+from models import db, Teacher
+from auth import authenticate, hash_password
+from sessions import rotate_session
+
+auth = Blueprint('auth', __name__)
+
+
+# Очистка сессии при каждом запросе к главной странице
+@auth.before_app_request
+def clear_session_on_index():
+    if request.endpoint == 'auth.index':
+        session.clear()
+
+@auth.route('/')
+def index():
+    return render_template('index.html')
+
+@auth.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        teacher = authenticate(username, password)
+        if teacher:
+            rotate_session(session)
+            session['teacher_id'] = teacher.id
+            flash('Вход успешен!', 'success')
+            return redirect(url_for('journal.class_list'))
+        else:
+            flash('Неверный логин или пароль.', 'danger')
+    return render_template('login.html')
+
+@auth.route('/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        full_name = request.form['full_name']
+        if Teacher.query.filter_by(username=username).first():
+            flash('Пользователь с таким логином уже существует.', 'danger')
+        else:
+            new_teacher = Teacher(username=username, password=hash_password(password), full_name=full_name)
+            db.session.add(new_teacher)
+            db.session.commit()
+            rotate_session(session)
+            session['teacher_id'] = new_teacher.id
+            flash('Регистрация успешна!', 'success')
+            return redirect(url_for('journal.class_list'))
+    return render_template('register.html')
+
+@auth.route('/logout')
+def logout():
+    session.clear()
+    flash('Вы вышли из системы.', 'success')
+    return redirect(url_for('auth.index'))
+
@@ -0,0 +1,45 @@
+"""Прогноз средней оценки и посещаемости на конец четверти (см. forecast.py)."""
+from datetime import datetime
+
+from flask import Blueprint, render_template, request, flash
+
+from models import db, Student
+from auth import login_required
+import cache
+
+forecast = Blueprint('forecast', __name__)
+
+
+@forecast.route('/forecast')
+@login_required
+def index():
+    # NumPy загружается при первом прогнозе, а не при старте каждого воркера
+    from forecast import default_term_end, forecast_school
+
+    term_end = request.args.get('term_end')
+    try:
+        term_end = datetime.strptime(term_end, '%Y-%m-%d').date() if term_end else default_term_end()
+    except ValueError:
+        flash('Неверная дата конца четверти.', 'danger')
+        term_end = default_term_end()
+
+    classes = sorted(cache.get_classes(), key=lambda class_: class_.name)
+    subjects = cache.get_subjects()
+    students = db.session.query(Student.id, Student.full_name, Student.class_id).order_by(
+        Student.full_name, Student.id
+    ).all()
+    predictions = forecast_school(students, subjects, term_end)
+
+    roster = {}
+    for student in students:
+        roster.setdefault(student.class_id, []).append(student)
+
+    return render_template(
+        'forecast.html',
+        classes=[class_ for class_ in classes if class_.id in roster],
+        subjects=subjects,
+        roster=roster,
+        predictions=predictions,
+        term_end=term_end.strftime('%Y-%m-%d')
+    )
+
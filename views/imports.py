@@ -0,0 +1,60 @@
+"""Импорт учеников, оценок и посещаемости из файла через браузер (см. importer.py).
+
+Строки с ошибками сохраняются в instance/import_errors и отдаются по ссылке со страницы итогов.
+"""
+import os
+import re
+import secrets
+
+from flask import Blueprint, current_app, render_template, request, flash, send_file, abort
+
+from importer import KINDS as IMPORT_KINDS, ImportFormatError, import_file
+from auth import login_required
+
+imports = Blueprint('imports', __name__)
+
+ERRORS_NAME = re.compile(r'^[0-9a-f]{32}\.csv$')
+
+
+def _errors_dir():
+    return os.path.join(current_app.instance_path, 'import_errors')
+
+
+@imports.route('/import', methods=['GET', 'POST'])
+@login_required
+def index():
+    result = None
+    errors_name = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        kind = request.form.get('kind')
+        if not upload or not upload.filename or kind not in IMPORT_KINDS:
+            flash('Выберите файл и вид данных.', 'danger')
+        else:
+            os.makedirs(_errors_dir(), exist_ok=True)
+            errors_name = secrets.token_hex(16) + '.csv'
+            errors_path = os.path.join(_errors_dir(), errors_name)
+            try:
+                with open(errors_path, 'w', encoding='utf-8-sig', newline='') as error_stream:
+                    result = import_file(upload.stream, upload.filename, kind, error_stream)
+            except ImportFormatError as e:
+                flash(str(e), 'danger')
+            finally:
+                # Файл ошибок остаётся, только если импорт прошёл и в нём есть ошибки
+                if result is None or not result.errors:
+                    os.remove(errors_path)
+                    errors_name = None
+            if result is not None:
+                flash(f'Импортировано записей: {result.imported} из {result.rows}', 'success')
+    return render_template('import.html', kinds=IMPORT_KINDS, result=result, errors_name=errors_name)
+
+@imports.route('/import/errors/<name>')
+@login_required
+def errors(name):
+    if not ERRORS_NAME.match(name):
+        abort(404)
+    path = os.path.join(_errors_dir(), name)
+    if not os.path.exists(path):
+        abort(404)
+    return send_file(path, mimetype='text/csv', as_attachment=True, download_name='import_errors.csv')
+
@@ -0,0 +1,239 @@
+"""Классы, ученики и формы журнала: посещаемость и оценки за день.
+
+Списки классов, предметов и учеников читаются из кэша справочников (cache.py),
+записи журнала — пачкой на класс, предмет и дату (journal.py).
+"""
+from datetime import datetime
+
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash
+
+from models import db, Class, Student, Attendance, Grade
+from journal import load_attendance, load_grades, apply_attendance, apply_grades, bump_revision
+from auth import login_required
+import summary
+import archive
+import cache
+
+journal = Blueprint('journal', __name__)
+
+
+def form_version(student_id):
+    """Версия записи, с которой была открыта форма журнала; 0 — записи тогда не было."""
+    value = request.form.get(f'version_{student_id}', '')
+    return int(value) if value.isdigit() else 0
+
+
+@journal.route('/classes')
+@login_required
+def class_list():
+    classes = cache.get_classes()
+    return render_template('classes.html', classes=classes)
+
+@journal.route('/class/<int:class_id>')
+@login_required
+def class_detail(class_id):
+    class_ = cache.get_class_or_404(class_id)
+    students = cache.get_roster(class_id)
+    return render_template('class_detail.html', class_=class_, students=students)
+
+@journal.route('/student/add', methods=['GET', 'POST'])
+@login_required
+def add_student():
+    if request.method == 'POST':
+        try:
+            full_name = request.form['full_name']
+            class_id = request.form['class_id']
+            new_student = Student(
+                full_name=full_name,
+                class_id=class_id
+            )
+            db.session.add(new_student)
+            bump_revision()
+            db.session.commit()
+            cache.invalidate_roster(class_id)
+            flash('Ученик успешно добавлен', 'success')
+            return redirect(url_for('journal.class_detail', class_id=class_id))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Ошибка: {str(e)}', 'error')
+    classes = cache.get_classes()
+    return render_template('student_form.html', classes=classes)
+
+@journal.route('/student/delete/<int:student_id>', methods=['POST'])
+@login_required
+def delete_student(student_id):
+    student = Student.query.get_or_404(student_id)
+    class_id = student.class_id
+    try:
+        # Сводки удаляются первыми: на них ссылается внешний ключ ученика
+        summary.forget_student(student.id)
+        # Записи журнала удаляются пачкой, без загрузки каждой через каскад отношений
+        Attendance.query.filter_by(student_id=student.id).delete(synchronize_session=False)
+        Grade.query.filter_by(student_id=student.id).delete(synchronize_session=False)
+        Student.query.filter_by(id=student.id).delete(synchronize_session=False)
+        bump_revision([student.id])
+        db.session.commit()
+        cache.invalidate_roster(class_id)
+        flash('Ученик успешно удалён', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Ошибка при удалении: {str(e)}', 'error')
+    return redirect(url_for('journal.class_detail', class_id=class_id))
+
+@journal.route('/attendance', methods=['GET', 'POST'])
+@login_required
+def attendance():
+    classes = cache.get_classes()
+    subjects = cache.get_subjects()
+    selected_class = None
+    selected_subject = None
+    selected_date = None
+    students = []
+    attendance_records = {}  # Словарь для хранения существующих записей
+    conflict_ids = set()  # Ученики, чьи отметки изменили с другой формы
+
+    if request.method == 'POST':
+        try:
+            class_id = request.form.get('class_id')
+            subject_id = request.form.get('subject_id')
+            selected_date = request.form.get('date')
+
+            if not class_id or not subject_id or not selected_date:
+                flash('Пожалуйста, выберите класс, предмет и дату.', 'danger')
+                return redirect(url_for('journal.attendance'))
+
+            date = datetime.strptime(selected_date, '%Y-%m-%d').date()
+            if archive.is_archived(date):
+                flash('Учебный год этой даты перенесён в архив, журнал за него не редактируется.', 'danger')
+                return redirect(url_for('journal.attendance'))
+            selected_class = cache.get_class_or_404(class_id)
+            selected_subject = cache.get_subject_or_404(subject_id)
+            students = cache.get_roster(selected_class.id)
+
+            if 'submit_attendance' in request.form:
+                # Пишем только ячейки, которые отличаются от состояния, загруженного в форму
+                changes = {}
+                for student in students:
+                    # Чекбокс передаётся в форме только если он отмечен, иначе его нет в request.form
+                    present = f'present_{student.id}' in request.form
+                    if request.form.get(f'orig_{student.id}', '') != ('1' if present else '0'):
+                        changes[student.id] = (present, form_version(student.id))
+
+                applied, conflicts = apply_attendance(selected_subject.id, date, changes)
+                db.session.commit()
+                current_app.logger.debug("Saved attendance changes: %s", {sid: changes[sid][0] for sid in applied})
+
+                if not conflicts:
+                    flash('Посещаемость успешно сохранена.', 'success')
+                    return redirect(url_for('journal.attendance'))
+                # Часть отметок успели изменить с другой формы: показываем свежие данные
+                conflict_ids = conflicts
+
+            # Получаем существующие записи посещаемости для выбранной даты, класса и предмета
+            attendance_records = load_attendance([student.id for student in students], selected_subject.id, date)
+
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Ошибка: {str(e)}', 'error')
+            current_app.logger.exception("Ошибка сохранения посещаемости")
+
+    return render_template(
+        'attendance.html',
+        classes=classes,
+        subjects=subjects,
+        selected_class=selected_class,
+        selected_subject=selected_subject,
+        selected_date=selected_date,
+        students=students,
+        attendance_records=attendance_records,
+        conflict_ids=conflict_ids
+    )
+
+@journal.route('/grades', methods=['GET', 'POST'])
+@login_required
+def grades():
+    classes = cache.get_classes()
+    subjects = cache.get_subjects()
+    selected_class = None
+    selected_subject = None
+    selected_date = None
+    students = []
+    grade_records = {}  # Словарь для хранения существующих оценок
+    conflict_ids = set()
+
+    if request.method == 'POST':
+        try:
+            class_id = request.form.get('class_id')
+            subject_id = request.form.get('subject_id')
+            selected_date = request.form.get('date')
+
+            if not class_id or not subject_id or not selected_date:
+                flash('Пожалуйста, выберите класс, предмет и дату.', 'danger')
+                return redirect(url_for('journal.grades'))
+
+            date = datetime.strptime(selected_date, '%Y-%m-%d').date()
+            if archive.is_archived(date):
+                flash('Учебный год этой даты перенесён в архив, журнал за него не редактируется.', 'danger')
+                return redirect(url_for('journal.grades'))
+            selected_class = cache.get_class_or_404(class_id)
+            selected_subject = cache.get_subject_or_404(subject_id)
+            students = cache.get_roster(selected_class.id)
+
+            if 'submit_grades' in request.form:
+                changes = {}
+                for student in students:
+                    grade_value = request.form.get(f'grade_{student.id}', '')
+                    # Пустой выбор оценку не удаляет; пишем только изменённые оценки
+                    if grade_value.isdigit() and grade_value != request.form.get(f'orig_{student.id}', ''):
+                        changes[student.id] = (int(grade_value), form_version(student.id))
+
+                applied, conflicts = apply_grades(selected_subject.id, date, changes)
+                db.session.commit()
+                current_app.logger.debug("Saved grade changes: %s", {sid: changes[sid][0] for sid in applied})
+
+                if not conflicts:
+                    flash('Оценки успешно сохранены.', 'success')
+                    return redirect(url_for('journal.grades'))
+                conflict_ids = conflicts
+
+            # Получаем существующие оценки для выбранной даты, класса и предмета
+            grade_records = load_grades([student.id for student in students], selected_subject.id, date)
+
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Ошибка: {str(e)}', 'error')
+
+    return render_template(
+        'grades.html',
+        classes=classes,
+        subjects=subjects,
+        selected_class=selected_class,
+        selected_subject=selected_subject,
+        selected_date=selected_date,
+        students=students,
+        grade_records=grade_records,  # Передаём существующие оценки
+        conflict_ids=conflict_ids
+    )
+
+
+@journal.route('/class/add', methods=['GET', 'POST'])
+@login_required
+def add_class():
+    if request.method == 'POST':
+        try:
+            name = request.form['name']
+            if Class.query.filter_by(name=name).first():
+                flash('Класс с таким названием уже существует.', 'danger')
+            else:
+                new_class = Class(name=name)
+                db.session.add(new_class)
+                bump_revision()
+                db.session.commit()
+                cache.invalidate_classes()
+                flash('Класс успешно добавлен.', 'success')
+                return redirect(url_for('journal.class_list'))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Ошибка: {str(e)}', 'error')
+    return render_template('class_form.html')
+
@@ -0,0 +1,175 @@
+"""Отчёты по классу и предмету за период, графики к ним и выгрузка в PDF.
+
+Очередь PDF (pdf_export.PdfJobs) создаётся при регистрации блюпринта, а ReportLab
+загружается только при сборке первого документа.
+"""
+import os
+from datetime import datetime
+
+from flask import (
+    Blueprint, current_app, render_template, request, redirect, url_for, flash,
+    Response, stream_with_context, send_file, abort, jsonify
+)
+
+from reporting import build_student_report, build_chart_data
+from journal import current_revision
+import archive
+from pdf_export import FONT_PATH, report_key, PdfJobs
+from batch_export import collect_entries, iter_zip
+from auth import login_required
+import cache
+
+reports = Blueprint('reports', __name__)
+
+
+@reports.record_once
+def init_pdf_jobs(state):
+    app = state.app
+    app.extensions['pdf_jobs'] = PdfJobs(
+        os.path.join(app.instance_path, 'pdf_cache'),
+        max_workers=app.config['PDF_WORKERS'],
+        cache_size=app.config['PDF_CACHE_SIZE']
+    )
+
+
+def _pdf_jobs():
+    return current_app.extensions['pdf_jobs']
+
+
+def _report_data(class_id, subject_id, start_date, end_date, revision, years=None):
+    """Строки отчёта из кэша: страница и /reports/chart-data собирают отчёт один раз.
+
+    Ревизию журнала вызывающий читает до сборки: если журнал изменится во время
+    сборки, данные лягут под старый ключ и не будут выданы как актуальные.
+    """
+    return cache.remember(
+        f'report:{class_id}:{subject_id}:{start_date}:{end_date}:r{revision}',
+        lambda: build_student_report(class_id, subject_id, start_date, end_date, years)
+    )
+
+
+def _chart_series(class_id, subject_id, start_date, end_date, revision):
+    years = archive.years_between(start_date, end_date)
+    student_data = _report_data(class_id, subject_id, start_date, end_date, revision, years)
+    return build_chart_data(class_id, subject_id, start_date, end_date, student_data, years)
+
+
+@reports.route('/reports', methods=['GET', 'POST'])
+@login_required
+def index():
+    classes = cache.get_classes()
+    subjects = cache.get_subjects()
+    selected_class = None
+    selected_subject = None
+    student_data = []
+
+    if request.method == 'POST':
+        try:
+            class_id = request.form.get('class_id')
+            subject_id = request.form.get('subject_id')
+            start_date = request.form.get('start_date')
+            end_date = request.form.get('end_date')
+
+            if not class_id or not subject_id or not start_date or not end_date:
+                flash('Пожалуйста, выберите класс, предмет и диапазон дат.', 'danger')
+                return redirect(url_for('reports.index'))
+
+            selected_class = cache.get_class_or_404(class_id)
+            selected_subject = cache.get_subject_or_404(subject_id)
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+            revision, _ = current_revision()
+            # Собираем данные для отчёта с фильтром по датам (постоянное число запросов)
+            student_data = _report_data(selected_class.id, selected_subject.id, start_date, end_date, revision)
+
+            # Экспорт в PDF, если запрошено
+            if 'export_pdf' in request.form:
+                # Генерация идёт в фоне; одинаковые данные собираются в PDF только один раз
+                job_id = report_key(selected_class.id, selected_subject.id, start_date, end_date, student_data)
+                title = f"Отчёт по классу {selected_class.name} ({selected_subject.name}) с {start_date} по {end_date}"
+                _pdf_jobs().submit(job_id, title, student_data)
+                return redirect(url_for(
+                    'reports.pdf', job_id=job_id,
+                    name=f"report_{selected_class.name}_{selected_subject.name}.pdf"
+                ))
+
+        except Exception as e:
+            flash(f'Ошибка: {str(e)}', 'error')
+
+    return render_template(
+        'reports.html',
+        classes=classes,
+        subjects=subjects,
+        selected_class=selected_class,
+        selected_subject=selected_subject,
+        student_data=student_data if student_data else None,
+        start_date=start_date.strftime('%Y-%m-%d') if 'start_date' in locals() else '',
+        end_date=end_date.strftime('%Y-%m-%d') if 'end_date' in locals() else ''
+    )
+
+@reports.route('/reports/chart-data')
+@login_required
+def chart_data():
+    """Ряды для графиков отчёта; страница отчёта загружает их отдельно от таблицы."""
+    try:
+        class_id = int(request.args['class_id'])
+        subject_id = int(request.args['subject_id'])
+        start_date = datetime.strptime(request.args['start'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args['end'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        abort(400)
+    cache.get_class_or_404(class_id)
+    cache.get_subject_or_404(subject_id)
+    # Ревизия журнала входит в ключ: после любых изменений ряды пересчитываются
+    revision, updated_at = current_revision()
+    key = f'chart:{class_id}:{subject_id}:{start_date}:{end_date}:r{revision}'
+    response = jsonify(cache.remember(key, lambda: _chart_series(
+        class_id, subject_id, start_date, end_date, revision
+    )))
+    response.set_etag(f'r{revision}')
+    response.last_modified = updated_at
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@reports.route('/reports/pdf/<job_id>')
+@login_required
+def pdf(job_id):
+    if not PdfJobs.valid_id(job_id):
+        abort(404)
+    status = _pdf_jobs().status(job_id)
+    if status == 'done':
+        return send_file(_pdf_jobs().path(job_id), as_attachment=True,
+                         download_name=request.args.get('name', 'report.pdf'), mimetype='application/pdf')
+    if status == 'error':
+        flash(f'Ошибка при создании PDF: {_pdf_jobs().pop_error(job_id)}', 'error')
+        return redirect(url_for('reports.index'))
+    if status == 'missing':
+        flash('Отчёт не найден, сформируйте его заново.', 'danger')
+        return redirect(url_for('reports.index'))
+    return render_template('report_pdf.html', job_id=job_id, name=request.args.get('name', 'report.pdf'))
+
+@reports.route('/reports/export-all', methods=['POST'])
+@login_required
+def export_all():
+    start_date = request.form.get('start_date')
+    end_date = request.form.get('end_date')
+    if not start_date or not end_date:
+        flash('Пожалуйста, выберите диапазон дат.', 'danger')
+        return redirect(url_for('reports.index'))
+    try:
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+    except ValueError:
+        flash('Неверный формат даты, ожидается ГГГГ-ММ-ДД.', 'danger')
+        return redirect(url_for('reports.index'))
+
+    # Данные читаем сразу, пока открыт контекст запроса; PDF собираются уже при отдаче архива
+    entries = collect_entries(start_date, end_date)
+    chunks = iter_zip(entries, FONT_PATH, current_app.config['BATCH_EXPORT_WORKERS'])
+    return Response(
+        stream_with_context(chunks),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename=reports_{start_date}_{end_date}.zip'}
+    )
+
@@ -0,0 +1,16 @@
+"""Точка входа для боевого WSGI-сервера.
+
+    gunicorn -w 4 -b 0.0.0.0:8000 wsgi:app
+
+Число воркеров подбирается по benchmarks/load_test.py. Для SQLite каждый воркер
+держит свой пул соединений в режиме WAL; при DATABASE_URL=postgresql://...
+размер пула задаётся DB_POOL_SIZE и DB_MAX_OVERFLOW (см. config.py).
+Перед первым запуском и после обновления схема базы готовится командой
+flask --app app init-db: сами воркеры таблиц не создают.
+"""
+from app import create_app
+
+app = create_app()
+
+if __name__ == '__main__':
+    app.run()